@@ -1,19 +1,39 @@
+import importlib.util
+import os
 import sqlite3
 
+# The query plan advisor lives with the query logging decorator; the file
+# name starts with a digit, so it is loaded by path rather than imported
+LOG_QUERIES = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                           '..', 'python-decorators-0x01', '0-log_queries.py')
+_spec = importlib.util.spec_from_file_location('log_queries', LOG_QUERIES)
+log_queries = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(log_queries)
+
+
 class ExecuteQuery:
     """A reusable class-based context manager for executing database queries."""
     
-    def __init__(self, db_name, query, params=None):
+    # One QueryPlanAdvisor per database, which explains each normalized
+    # statement once
+    advisors = {}
+    # Full scans of smaller tables are cheap enough not to warn about
+    large_table_rows = 1000
+    
+    def __init__(self, db_name, query, params=None, explain=False):
         """Initialize the query execution context manager.
         
         Args:
             db_name (str): The name of the database file
             query (str): The SQL query to execute
             params (tuple, optional): Parameters for the query
+            explain (bool, optional): Print the query plan the first time
+                the query runs and warn about full table scans
         """
         self.db_name = db_name
         self.query = query
         self.params = params or ()
+        self.explain = explain
         self.connection = None
         self.cursor = None
         self.results = None
@@ -29,6 +49,9 @@ class ExecuteQuery:
             self.cursor = self.connection.cursor()
             print(f"Database connection to '{self.db_name}' established.")
             
+            if self.explain:
+                self.explain_query()
+            
             # Execute the query with parameters
             self.cursor.execute(self.query, self.params)
             self.results = self.cursor.fetchall()
@@ -41,8 +64,41 @@ class ExecuteQuery:
             
         except sqlite3.Error as e:
             print(f"Error executing query: {e}")
+            # __exit__ does not run when __enter__ raises
+            if self.connection:
+                self.connection.close()
             raise
     
+    def explain_query(self):
+        """Print the query plan and suggest an index for each full scan of a large table.
+        
+        The plan is read by log_queries.QueryPlanAdvisor the first time the
+        statement runs; later runs print nothing. Errors are printed rather
+        than raised, so a diagnostic never stops the query itself.
+        
+        Returns:
+            list: The flagged scans, as dicts with table, rows and suggestion
+        """
+        advisor = ExecuteQuery.advisors.get(self.db_name)
+        if advisor is None:
+            advisor = ExecuteQuery.advisors[self.db_name] = log_queries.QueryPlanAdvisor(
+                self.db_name, large_table_rows=self.large_table_rows)
+        statement = log_queries.normalize_statement(self.query)
+        if statement in advisor.plans:
+            return []
+        advisor.observe(statement, self.query, self.params, self.connection)
+        advice = advisor.plans[statement]
+        if 'error' in advice:
+            print(f"Could not explain query: {advice['error']}")
+            return []
+        print(f"Query plan: {'; '.join(advice['plan'])}")
+        scans = [scan for scan in advice['scans'] if scan['table']]
+        for scan in scans:
+            print(f"Warning: full scan of {scan['table']} (~{scan['rows']} rows)")
+            if scan['suggestion']:
+                print(f"Suggestion: {scan['suggestion']}")
+        return scans
+    
     def __exit__(self, exc_type, exc_val, exc_tb):
         """Exit the context manager and close database connection.
         
@@ -118,7 +174,7 @@ def main():
     print("EXECUTING QUERY WITH CONTEXT MANAGER")
     print("=" * 60)
     
-    with ExecuteQuery(db_name, query, (age_threshold,)) as results:
+    with ExecuteQuery(db_name, query, (age_threshold,), explain=True) as results:
         print(f"\nFound {len(results)} users older than {age_threshold}:")
         print("-" * 60)
         print(f"{'ID':<5} {'Name':<15} {'Age':<5} {'Email':<25}")
@@ -1,21 +1,425 @@
 import sqlite3
 import functools
+import atexit
+import bisect
+import inspect
+import queue
+import random
+import re
+import sys
+import threading
+import time
+from collections import deque
 from datetime import datetime
 
+#### query profiling
+
+# Upper bounds of the latency histogram buckets in seconds: 50us doubling to ~105s
+LATENCY_BUCKETS = [0.00005 * 2 ** i for i in range(22)]
+
+STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+PLACEHOLDER_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+WHITESPACE = re.compile(r"\s+")
+
+@functools.lru_cache(maxsize=4096)
+def normalize_statement(query):
+    """Reduces SQL to its shape: literals become ?, IN lists and whitespace collapse"""
+    query = STRING_LITERAL.sub('?', query)
+    query = NUMBER_LITERAL.sub('?', query)
+    query = PLACEHOLDER_LIST.sub('(?, ...)', query)
+    return WHITESPACE.sub(' ', query).strip()
+
+class LatencyHistogram:
+    """Fixed log-scale histogram of query latencies"""
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.rows = 0
+
+    def add(self, elapsed, rows=None):
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS, elapsed)] += 1
+        self.count += 1
+        self.total += elapsed
+        if elapsed > self.max:
+            self.max = elapsed
+        if rows:
+            self.rows += rows
+
+    def quantile(self, q):
+        """Returns the upper bound of the bucket holding the q-th latency"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS + [self.max], self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'total': self.total,
+            'mean': self.total / self.count if self.count else 0.0,
+            'p50': self.quantile(0.5),
+            'p95': self.quantile(0.95),
+            'p99': self.quantile(0.99),
+            'max': self.max,
+            'rows': self.rows,
+        }
+
+class QueryProfiler:
+    """Collects per-statement latency histograms and a slow-query log
+
+    Aggregation happens inline under a lock and costs a few microseconds;
+    formatting and writing log lines is left to a background thread fed by a
+    bounded queue, so a slow log destination never delays a query. When the
+    queue is full, records are dropped and counted rather than waited for.
+    """
+
+    def __init__(self, sample_rate=1.0, slow_threshold=0.1, slow_log_size=100,
+                 stream=None, queue_size=10000, advisor=None):
+        """
+        Args:
+            sample_rate (float): Fraction of queries written to the log; slow
+                queries are always written, and every query is aggregated
+            slow_threshold (float): Seconds above which a query is slow
+            slow_log_size (int): Most recent slow queries kept in slow_log
+            stream: File the writer thread writes to; defaults to stdout
+            queue_size (int): Most records waiting for the writer thread
+            advisor (QueryPlanAdvisor): Explains each new statement; off by default
+        """
+        self.sample_rate = sample_rate
+        self.slow_threshold = slow_threshold
+        self.slow_log = deque(maxlen=slow_log_size)
+        self.stream = stream
+        self.advisor = advisor
+        self.statements = {}  # normalized SQL -> LatencyHistogram
+        self.dropped = 0
+        self._lock = threading.Lock()
+        self._queue = queue.Queue(queue_size)
+        self._writer = None
+
+    def record(self, query, params, elapsed, rows=None, error=None):
+        """Aggregates one execution and queues it for the log if sampled or slow"""
+        statement = normalize_statement(query)
+        slow = elapsed >= self.slow_threshold
+        entry = None
+        if slow or random.random() < self.sample_rate:
+            entry = (time.time(), query, params, elapsed, rows, error, slow)
+        with self._lock:
+            histogram = self.statements.get(statement)
+            if histogram is None:
+                histogram = self.statements[statement] = LatencyHistogram()
+            histogram.add(elapsed, rows)
+            if slow:
+                self.slow_log.append(entry)
+        if entry is not None:
+            self._enqueue(entry)
+
+    def _enqueue(self, entry):
+        if self._writer is None:
+            self._start_writer()
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+
+    def _start_writer(self):
+        with self._lock:
+            if self._writer is not None:
+                return
+            self._writer = threading.Thread(target=self._write_entries, name='query-log-writer',
+                                            daemon=True)
+            self._writer.start()
+        atexit.register(self.flush)
+
+    def _write_entries(self):
+        while True:
+            entry = self._queue.get()
+            try:
+                if entry is None:
+                    return
+                stream = self.stream or sys.stdout
+                stream.write(format_entry(entry) + '\n')
+                stream.flush()
+            finally:
+                self._queue.task_done()
+
+    def flush(self):
+        """Waits until every queued record has been written"""
+        if self._writer is not None and self._writer.is_alive():
+            self._queue.join()
+
+    def report(self, top=None):
+        """Returns per-statement latency summaries, largest total time first"""
+        with self._lock:
+            rows = [dict(statement=statement, **histogram.summary())
+                    for statement, histogram in self.statements.items()]
+        rows.sort(key=lambda row: row['total'], reverse=True)
+        return rows[:top] if top else rows
+
+    def plan_report(self):
+        """Returns the advisor's flagged statements ranked by time spent scanning"""
+        if self.advisor is None:
+            return []
+        return self.advisor.report(self)
+
+    def reset(self):
+        """Forgets all aggregated statements and slow queries"""
+        with self._lock:
+            self.statements.clear()
+            self.slow_log.clear()
+            self.dropped = 0
+
+#### query plan advice
+
+# "SCAN users" (SQLite 3.36+) or "SCAN TABLE users"; "SCAN users USING ... INDEX" reads an index
+FULL_SCAN = re.compile(r'^SCAN (?:TABLE )?(\w+)(?: AS \w+)?$')
+# SQLite builds a throwaway index on every run when a join lacks a real one
+AUTOMATIC_INDEX = re.compile(r'^SEARCH (\w+) USING AUTOMATIC (?:COVERING |PARTIAL )*INDEX \((.*)\)')
+TABLE_ALIAS = re.compile(r'\b(?:FROM|JOIN)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?', re.IGNORECASE)
+TEMP_SORT = re.compile(r'^USE TEMP B-TREE FOR (ORDER BY|GROUP BY|DISTINCT)')
+# Column compared in a WHERE clause; the operator tells equality from range
+WHERE_TERM = re.compile(
+    r'(?:\b\w+\.)?(\w+)\s*(=|==|<=|>=|<>|!=|<|>|\bIN\b|\bLIKE\b|\bBETWEEN\b|\bIS\b)',
+    re.IGNORECASE)
+WHERE_CLAUSE = re.compile(
+    r'\bWHERE\b(.*?)(?:\bGROUP\s+BY\b|\bORDER\s+BY\b|\bLIMIT\b|$)',
+    re.IGNORECASE | re.DOTALL)
+SELECT_LIST = re.compile(r'^\s*SELECT\s+(?:DISTINCT\s+)?(.*?)\s+FROM\b', re.IGNORECASE | re.DOTALL)
+
+def suggest_index(query, table, columns):
+    """Suggests an index for the WHERE clause of query on table, or None
+
+    Equality columns come first and at most one range column follows, which
+    is the order SQLite can use. Explicitly selected columns are appended so
+    the index also covers the query and the table itself is never read.
+    """
+    where = WHERE_CLAUSE.search(query)
+    if not where:
+        return None
+    equality, ranges = [], []
+    for column, operator in WHERE_TERM.findall(where.group(1)):
+        column = column.lower()
+        if column not in columns or column in equality or column in ranges:
+            continue
+        if operator.upper() in ('=', '==', 'IN', 'IS'):
+            equality.append(column)
+        else:
+            ranges.append(column)
+    key = equality + ranges[:1]
+    if not key:
+        return None
+    selected = SELECT_LIST.match(query)
+    covering = []
+    if selected and selected.group(1).strip() != '*':
+        for item in selected.group(1).split(','):
+            name = item.strip().split('.')[-1].lower()
+            if name in columns and name not in key and name not in covering:
+                covering.append(name)
+    return f"CREATE INDEX idx_{table}_{'_'.join(key)} ON {table} ({', '.join(key + covering)})"
+
+class QueryPlanAdvisor:
+    """Runs EXPLAIN QUERY PLAN once per normalized statement and flags full scans
+
+    A plan step that scans a table of at least large_table_rows rows without
+    an index is flagged with an index suggestion. Plans are read on the
+    connection passed to the decorated function when there is one, otherwise
+    on a connection to database.
+    """
+
+    def __init__(self, database=None, large_table_rows=1000):
+        """
+        Args:
+            database (str): Database to explain queries against when the
+                decorated function is not given a connection
+            large_table_rows (int): Smallest table worth flagging a scan of
+        """
+        self.database = database
+        self.large_table_rows = large_table_rows
+        self.plans = {}  # normalized SQL -> {'plan': [...], 'scans': [...]}
+        self._table_rows = {}  # table -> estimated rows
+        self._lock = threading.Lock()
+
+    def observe(self, statement, query, params, conn=None):
+        """Explains statement the first time it is seen"""
+        with self._lock:
+            if statement in self.plans:
+                return
+            self.plans[statement] = None  # claimed; other threads skip it
+        try:
+            advice = self._explain(query, params, conn)
+        except sqlite3.Error as e:
+            advice = {'plan': [], 'scans': [], 'error': str(e)}
+        with self._lock:
+            self.plans[statement] = advice
+
+    def _explain(self, query, params, conn):
+        own = conn is None
+        if own:
+            if self.database is None:
+                raise sqlite3.OperationalError("no connection or database to explain against")
+            conn = sqlite3.connect(f"file:{self.database}?mode=ro", uri=True)
+        try:
+            plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {query}", params or ())]
+            # Plans name tables by their alias when the query gives one
+            aliases = {(alias or table).lower(): table for table, alias in TABLE_ALIAS.findall(query)}
+            scans = []
+            for detail in plan:
+                scan = FULL_SCAN.match(detail)
+                automatic = AUTOMATIC_INDEX.match(detail)
+                if scan or automatic:
+                    table = aliases.get((scan or automatic).group(1).lower(), (scan or automatic).group(1))
+                    rows = self._estimate_rows(conn, table)
+                    if rows < self.large_table_rows:
+                        continue
+                    if automatic:
+                        key = [term.split('=')[0].strip() for term in automatic.group(2).split(' AND ')]
+                        suggestion = f"CREATE INDEX idx_{table}_{'_'.join(key)} ON {table} ({', '.join(key)})"
+                    else:
+                        columns = {row[1].lower() for row in conn.execute(f"PRAGMA table_info({table})")}
+                        suggestion = suggest_index(query, table, columns)
+                    scans.append({'table': table, 'rows': rows, 'suggestion': suggestion})
+                elif TEMP_SORT.match(detail):
+                    scans.append({'table': None, 'rows': None, 'suggestion': None,
+                                  'note': detail})
+            return {'plan': plan, 'scans': scans}
+        finally:
+            if own:
+                conn.close()
+
+    def _estimate_rows(self, conn, table):
+        if table not in self._table_rows:
+            try:
+                # O(log n) on rowid tables, and close to COUNT(*) unless rows were deleted
+                rows = conn.execute(f"SELECT MAX(rowid) FROM {table}").fetchone()[0]
+            except sqlite3.OperationalError:
+                rows = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            self._table_rows[table] = rows or 0
+        return self._table_rows[table]
+
+    def report(self, profiler):
+        """Returns flagged statements, most time spent in unindexed scans first"""
+        timings = {row['statement']: row for row in profiler.report()}
+        with self._lock:
+            flagged = [(statement, advice) for statement, advice in self.plans.items()
+                       if advice and any(scan['table'] for scan in advice['scans'])]
+        rows = []
+        for statement, advice in flagged:
+            timing = timings.get(statement, {})
+            rows.append({
+                'statement': statement,
+                'count': timing.get('count', 0),
+                'scan_time': timing.get('total', 0.0),
+                'plan': advice['plan'],
+                'scans': [scan for scan in advice['scans'] if scan['table']],
+                'suggestions': sorted({scan['suggestion'] for scan in advice['scans']
+                                       if scan['suggestion']}),
+            })
+        rows.sort(key=lambda row: row['scan_time'], reverse=True)
+        return rows
+
+def format_plan_report(rows):
+    """Formats QueryPlanAdvisor.report() as text"""
+    if not rows:
+        return "No full scans of large tables found"
+    lines = []
+    for rank, row in enumerate(rows, 1):
+        scans = ', '.join(f"{scan['table']} (~{scan['rows']} rows)" for scan in row['scans'])
+        lines.append(f"{rank}. {row['scan_time'] * 1000:.1f} ms over {row['count']} calls, "
+                     f"scans {scans}: {row['statement']}")
+        lines.extend(f"   suggest: {suggestion}" for suggestion in row['suggestions'])
+    return '\n'.join(lines)
+
+def format_entry(entry):
+    """Formats a queued record as one log line"""
+    timestamp, query, params, elapsed, rows, error, slow = entry
+    line = (f"{datetime.fromtimestamp(timestamp).isoformat(timespec='milliseconds')} "
+            f"{'SLOW ' if slow else ''}Executed SQL Query in {elapsed * 1000:.3f} ms: {query}")
+    if params:
+        line += f" params={params!r}"
+    if rows is not None:
+        line += f" rows={rows}"
+    if error is not None:
+        line += f" error={error!r}"
+    return line
+
+profiler = QueryProfiler()
+
+def configure_profiler(**options):
+    """Replaces the shared profiler; takes QueryProfiler's keyword arguments"""
+    global profiler
+    profiler.flush()
+    profiler = QueryProfiler(**options)
+    return profiler
+
+def extract_query(signature, args, kwargs):
+    """Finds the SQL and its parameters among a call's arguments
+
+    The SQL is the argument bound to a parameter named 'query' or 'sql',
+    passed by keyword or position; other strings, such as a user name, are
+    never taken for SQL, and a call without such an argument is not
+    profiled. Parameters come from a 'params' or 'parameters' argument.
+    """
+    try:
+        bound = signature.bind_partial(*args, **kwargs).arguments
+    except TypeError:
+        bound = dict(kwargs)
+    query = bound.get('query', bound.get('sql'))
+    if not isinstance(query, str):
+        return None, None
+    params = bound.get('params', bound.get('parameters'))
+    return query, params
+
+def result_rows(result):
+    """Counts the rows in a query function's result
+
+    A list is a list of rows (fetchall); a single tuple or sqlite3.Row is one
+    row (fetchone) and None is no row. Anything else is not counted.
+    """
+    if isinstance(result, list):
+        return len(result)
+    if isinstance(result, (tuple, sqlite3.Row)):
+        return 1
+    if result is None:
+        return 0
+    return None
+
 #### decorator to log SQL queries
 
 def log_queries(func):
-    """Decorator that logs SQL queries before executing them"""
+    """Decorator that profiles SQL queries: timing, rows returned and parameters"""
+    # Inspected once here rather than on every call
+    signature = inspect.signature(func)
+
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        # Extract the query - assuming it's passed as 'query' keyword argument
-        if 'query' in kwargs:
-            query = kwargs['query']
-            print(f"Executing SQL Query: {query}")
-        
-        # Execute the original function
-        return func(*args, **kwargs)
-    
+        # Extract the query, passed by keyword or position
+        query, params = extract_query(signature, args, kwargs)
+        if query is None:
+            return func(*args, **kwargs)
+
+        # Execute the original function and time it
+        started = time.perf_counter()
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            profiler.record(query, params, time.perf_counter() - started, error=e)
+            raise
+        rows = result_rows(result)
+        profiler.record(query, params, time.perf_counter() - started, rows)
+        if profiler.advisor is not None:
+            conn = next((arg for arg in args if isinstance(arg, sqlite3.Connection)), None)
+            profiler.advisor.observe(normalize_statement(query), query, params, conn)
+        return result
+
     return wrapper
 
 @log_queries
@@ -27,5 +431,6 @@ def fetch_all_users(query):
     conn.close()
     return results
 
-#### fetch users while logging the query
-users = fetch_all_users(query="SELECT * FROM users")
\ No newline at end of file
+if __name__ == "__main__":
+    #### fetch users while logging the query
+    users = fetch_all_users(query="SELECT * FROM users")
\ No newline at end of file
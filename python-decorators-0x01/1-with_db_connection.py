@@ -1,21 +1,355 @@
 import sqlite3 
 import functools
+import asyncio
+import inspect
+import threading
+import time
+import weakref
+from collections import deque
+
+try:
+    import aiosqlite
+except ImportError:  # only needed to decorate async def functions
+    aiosqlite = None
+
+# Database opened by with_db_connection unless configure_pool() says otherwise
+DATABASE = 'example.db'
+
+def reset_connection(conn):
+    """Puts back the per-connection settings a fresh sqlite3 connection starts with
+
+    Covers the attributes and callbacks a decorated function may change;
+    PRAGMAs cannot be told apart from the database's own, so functions that
+    set them should use a pool with reuse=False.
+    """
+    conn.row_factory = None
+    conn.text_factory = str
+    conn.isolation_level = ''
+    conn.set_trace_callback(None)
+    conn.set_authorizer(None)
+    conn.set_progress_handler(None, 0)
+
+class ConnectionPool:
+    """Bounded pool of reusable sqlite3 connections
+
+    Connections are checked out by one thread at a time, so they are opened with
+    check_same_thread=False and handed between threads. Each checkout runs a
+    cheap health check, and each return rolls back whatever the caller left
+    uncommitted and resets the connection's settings (reset_connection), just
+    like closing the connection would have.
+    """
+
+    def __init__(self, database=DATABASE, max_size=5, timeout=30.0, reuse=True):
+        """
+        Args:
+            database (str): Path of the SQLite database file
+            max_size (int): Most connections checked out at once
+            timeout (float): Seconds to wait for a free connection
+            reuse (bool): Keep returned connections open for the next caller;
+                False opens and closes one per call like the original decorator
+        """
+        self.database = database
+        self.max_size = max_size
+        self.timeout = timeout
+        self.reuse = reuse
+        self._idle = deque()
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.discarded = 0
+        self.waits = 0
+        self.wait_time = 0.0
+
+    def _connect(self):
+        return sqlite3.connect(self.database, check_same_thread=False)
+
+    def acquire(self):
+        """Checks a healthy connection out of the pool, opening one if needed"""
+        started = time.monotonic()
+        if not self._slots.acquire(blocking=False):
+            if not self._slots.acquire(timeout=self.timeout):
+                raise TimeoutError(
+                    f"No connection to {self.database} free after {self.timeout}s")
+            with self._lock:
+                self.waits += 1
+                self.wait_time += time.monotonic() - started
+        try:
+            while True:
+                with self._lock:
+                    conn = self._idle.pop() if self._idle else None
+                if conn is None:
+                    with self._lock:
+                        self.misses += 1
+                    return self._connect()
+                try:
+                    conn.execute("SELECT 1")
+                except sqlite3.Error:
+                    self._discard(conn)
+                    continue
+                with self._lock:
+                    self.hits += 1
+                return conn
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, conn):
+        """Returns a connection, rolling back anything left uncommitted and resetting its settings"""
+        try:
+            if not self.reuse:
+                conn.close()
+                return
+            try:
+                if conn.in_transaction:
+                    conn.rollback()
+                reset_connection(conn)
+            except sqlite3.Error:
+                self._discard(conn)
+                return
+            with self._lock:
+                self._idle.append(conn)
+        finally:
+            self._slots.release()
+
+    def _discard(self, conn):
+        with self._lock:
+            self.discarded += 1
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+    def close(self):
+        """Closes every idle connection"""
+        with self._lock:
+            idle, self._idle = self._idle, deque()
+        for conn in idle:
+            conn.close()
+
+    def stats(self):
+        """Returns checkout, wait and size counters"""
+        with self._lock:
+            return {
+                'database': self.database,
+                'hits': self.hits,
+                'misses': self.misses,
+                'discarded': self.discarded,
+                'waits': self.waits,
+                'wait_time': self.wait_time,
+                'idle': len(self._idle),
+                'max_size': self.max_size,
+            }
+
+class AsyncConnectionPool:
+    """asyncio counterpart of ConnectionPool, holding aiosqlite connections
+
+    Belongs to one event loop, so it needs no thread locks: checkouts wait on
+    an asyncio.Semaphore and never block the loop. Each aiosqlite connection
+    runs a thread that keeps the interpreter from exiting, so the idle ones
+    are closed when the loop shuts down: asyncio.run() does this on its own,
+    a loop run by hand must await close_async_pool() before it is closed.
+    """
+
+    def __init__(self, database=DATABASE, max_size=5, timeout=30.0):
+        if aiosqlite is None:
+            raise ImportError("aiosqlite is required to decorate async def functions")
+        self.database = database
+        self.max_size = max_size
+        self.timeout = timeout
+        self.loop = None
+        self._idle = deque()
+        self._slots = asyncio.Semaphore(max_size)
+        self._shutdown_hook = None
+        self._closed = False
+        self.hits = 0
+        self.misses = 0
+        self.discarded = 0
+        self.waits = 0
+        self.wait_time = 0.0
+
+    async def _close_at_shutdown(self):
+        # The loop closes unfinished async generators when it shuts down
+        try:
+            yield
+        finally:
+            await self.close()
+
+    async def acquire(self):
+        """Checks a healthy connection out of the pool, opening one if needed"""
+        if self._shutdown_hook is None:
+            self.loop = asyncio.get_running_loop()
+            self._shutdown_hook = self._close_at_shutdown()
+            await self._shutdown_hook.__anext__()
+        started = time.monotonic()
+        if self._slots.locked():
+            try:
+                await asyncio.wait_for(self._slots.acquire(), self.timeout)
+            except asyncio.TimeoutError:
+                raise TimeoutError(
+                    f"No connection to {self.database} free after {self.timeout}s") from None
+            self.waits += 1
+            self.wait_time += time.monotonic() - started
+        else:
+            await self._slots.acquire()
+        try:
+            while self._idle:
+                conn = self._idle.pop()
+                try:
+                    await conn.execute("SELECT 1")
+                except sqlite3.Error:
+                    await self._discard(conn)
+                    continue
+                self.hits += 1
+                return conn
+            self.misses += 1
+            return await aiosqlite.connect(self.database)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    async def release(self, conn):
+        """Returns a connection, rolling back anything left uncommitted and resetting its factories"""
+        try:
+            if self._closed:
+                await self._discard(conn)
+                return
+            try:
+                if conn.in_transaction:
+                    await conn.rollback()
+            except sqlite3.Error:
+                await self._discard(conn)
+                return
+            conn.row_factory = None
+            conn.text_factory = str
+            self._idle.append(conn)
+        finally:
+            self._slots.release()
+
+    async def _discard(self, conn):
+        self.discarded += 1
+        try:
+            await conn.close()
+        except sqlite3.Error:
+            pass
+
+    async def close(self):
+        """Closes every idle connection; connections still checked out are closed on release"""
+        self._closed = True
+        idle, self._idle = self._idle, deque()
+        for conn in idle:
+            await conn.close()
+
+    def close_threadsafe(self):
+        """Closes the pool from outside its event loop, e.g. after the loop has stopped"""
+        loop = self.loop
+        if loop is not None and loop.is_running():
+            asyncio.run_coroutine_threadsafe(self.close(), loop)
+            return
+        self._closed = True
+        idle, self._idle = self._idle, deque()
+        for conn in idle:
+            # Nothing can await close() any more: just stop the connection's thread
+            conn.stop()
+
+    def stats(self):
+        """Returns checkout, wait and size counters"""
+        return {
+            'database': self.database,
+            'hits': self.hits,
+            'misses': self.misses,
+            'discarded': self.discarded,
+            'waits': self.waits,
+            'wait_time': self.wait_time,
+            'idle': len(self._idle),
+            'max_size': self.max_size,
+        }
+
+_pool = None
+_pool_lock = threading.Lock()
+# Options of the shared pool, reused for the async pool of each event loop
+_pool_options = {}
+_async_pools = weakref.WeakKeyDictionary()
+
+def get_pool():
+    """Returns the shared pool, creating it for DATABASE on first use"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool(DATABASE)
+        return _pool
+
+def configure_pool(database=None, **options):
+    """Replaces the shared pool, e.g. configure_pool('users.db', max_size=10)
+
+    Args:
+        database (str): Database path; defaults to DATABASE
+        **options: Further keyword arguments for ConnectionPool
+    """
+    global _pool, _pool_options
+    with _pool_lock:
+        old, _pool = _pool, ConnectionPool(database or DATABASE, **options)
+        _pool_options = dict(options, database=database or DATABASE)
+        # Event loops create their async pool again with the new options
+        old_async = list(_async_pools.values())
+        _async_pools.clear()
+    if old is not None:
+        old.close()
+    for pool in old_async:
+        pool.close_threadsafe()
+    return _pool
+
+def get_async_pool():
+    """Returns the async pool of the running event loop, creating it on first use"""
+    loop = asyncio.get_running_loop()
+    pool = _async_pools.get(loop)
+    if pool is None:
+        options = dict(_pool_options or {'database': DATABASE})
+        options.pop('reuse', None)
+        pool = _async_pools[loop] = AsyncConnectionPool(**options)
+    return pool
+
+async def close_async_pool():
+    """Closes the running event loop's async pool
+
+    Only needed when the loop is not run by asyncio.run(), which closes it
+    at shutdown.
+    """
+    pool = _async_pools.pop(asyncio.get_running_loop(), None)
+    if pool is not None:
+        await pool.close()
 
 def with_db_connection(func):
-    """Decorator that automatically handles opening and closing database connections"""
+    """Decorator that automatically handles opening and closing database connections
+
+    async def functions get an aiosqlite connection from the event loop's
+    AsyncConnectionPool and are awaited, so the loop is never blocked.
+    """
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            pool = get_async_pool()
+            conn = await pool.acquire()
+            try:
+                return await func(conn, *args, **kwargs)
+            finally:
+                await pool.release(conn)
+        return async_wrapper
+
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        # Open database connection
-        conn = sqlite3.connect('example.db')
+        # Check a connection out of the shared pool
+        pool = get_pool()
+        conn = pool.acquire()
         try:
             # Call the original function with the connection as first argument
             result = func(conn, *args, **kwargs)
             return result
         finally:
-            # Always close the connection
-            conn.close()
+            # Always hand the connection back
+            pool.release(conn)
     return wrapper
-    
+
 @with_db_connection 
 def get_user_by_id(conn, user_id): 
     cursor = conn.cursor() 
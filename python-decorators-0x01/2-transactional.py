@@ -1,12 +1,56 @@
 import sqlite3 
 import functools
+import contextlib
+import inspect
+import itertools
+import sys
+import threading
+import time
+
+try:
+    import aiosqlite
+except ImportError:  # only needed to decorate async def functions
+    aiosqlite = None
+
+# Database opened by with_db_connection
+DATABASE = 'example.db'
+
+# Connection of the batch() block open on each thread, if any
+_local = threading.local()
+
+# The GroupCommitter set up by enable_group_commit(), if any
+_group_committer = None
 
 def with_db_connection(func):
-    """Decorator that automatically handles opening and closing database connections"""
+    """Decorator that automatically handles opening and closing database connections
+
+    Inside a batch() block the block's connection is reused, and with group
+    commit enabled the call runs on the shared group-commit connection.
+    async def functions get their own aiosqlite connection and are awaited.
+    """
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            if aiosqlite is None:
+                raise ImportError("aiosqlite is required to decorate async def functions")
+            conn = await aiosqlite.connect(DATABASE)
+            try:
+                return await func(conn, *args, **kwargs)
+            finally:
+                await conn.close()
+        return async_wrapper
+
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
+        batch_conn = getattr(_local, 'conn', None)
+        if batch_conn is not None:
+            return func(batch_conn, *args, **kwargs)
+        committer = _group_committer
+        if committer is not None:
+            return committer.run(func, args, kwargs)
+
         # Open database connection
-        conn = sqlite3.connect('example.db')
+        conn = sqlite3.connect(DATABASE)
         try:
             # Call the original function with the connection as first argument
             result = func(conn, *args, **kwargs)
@@ -16,12 +60,68 @@ def with_db_connection(func):
             conn.close()
     return wrapper
 
+# Unique savepoint names, so nested levels never release each other's
+_savepoint_ids = itertools.count()
+
+@contextlib.contextmanager
+def savepoint(conn):
+    """Runs a block in a SAVEPOINT: on error only the block's changes are undone"""
+    name = f"sp_{next(_savepoint_ids)}"
+    conn.execute(f"SAVEPOINT {name}")
+    try:
+        yield
+    except BaseException:
+        conn.execute(f"ROLLBACK TO {name}")
+        conn.execute(f"RELEASE {name}")
+        raise
+    conn.execute(f"RELEASE {name}")
+
+@contextlib.asynccontextmanager
+async def async_savepoint(conn):
+    """savepoint() for aiosqlite connections"""
+    name = f"sp_{next(_savepoint_ids)}"
+    await conn.execute(f"SAVEPOINT {name}")
+    try:
+        yield
+    except BaseException:
+        await conn.execute(f"ROLLBACK TO {name}")
+        await conn.execute(f"RELEASE {name}")
+        raise
+    await conn.execute(f"RELEASE {name}")
+
 def transactional(func):
-    """Decorator that manages database transactions by automatically committing or rolling back changes"""
+    """Decorator that manages database transactions by automatically committing or rolling back changes
+
+    Called while a transaction is already open on conn (by an outer
+    transactional call, a batch() block or group commit), it runs in a
+    SAVEPOINT instead: a failure rolls back only this call, and the commit is
+    left to whoever opened the transaction. async def functions are handled
+    the same way on aiosqlite connections.
+    """
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(conn, *args, **kwargs):
+            if conn.in_transaction:
+                async with async_savepoint(conn):
+                    return await func(conn, *args, **kwargs)
+            try:
+                await conn.execute("BEGIN")
+                result = await func(conn, *args, **kwargs)
+                await conn.commit()
+                return result
+            except Exception:
+                await conn.rollback()
+                raise
+        return async_wrapper
+
     @functools.wraps(func)
     def wrapper(conn, *args, **kwargs):
+        if conn.in_transaction:
+            with savepoint(conn):
+                return func(conn, *args, **kwargs)
         try:
-            # Start transaction (implicit with sqlite3)
+            # Start the transaction explicitly, so nested calls see it open
+            conn.execute("BEGIN")
             result = func(conn, *args, **kwargs)
             # Commit if no exception occurred
             conn.commit()
@@ -32,6 +132,140 @@ def transactional(func):
             raise e
     return wrapper
 
+@contextlib.contextmanager
+def batch(database=None):
+    """Makes every with_db_connection call on this thread share one connection and commit
+
+    Each transactional call inside the block still succeeds or fails on its
+    own, in a savepoint; the calls that succeeded are committed together
+    when the block ends, even if it ends with an exception, which is then
+    re-raised.
+    """
+    if getattr(_local, 'conn', None) is not None:
+        # Already batching: join the outer block
+        yield _local.conn
+        return
+    conn = sqlite3.connect(database or DATABASE)
+    _local.conn = conn
+    try:
+        conn.execute("BEGIN")
+        try:
+            yield conn
+        finally:
+            conn.commit()
+    finally:
+        _local.conn = None
+        conn.close()
+
+class _Group:
+    """Calls sharing one commit"""
+
+    def __init__(self):
+        self.size = 0
+        self.committed = threading.Event()
+        self.error = None
+
+class GroupCommitter:
+    """Lets concurrent callers share commits (leader/follower group commit)
+
+    All calls run on one connection, one at a time, each in its own
+    savepoint. The first call of a group becomes its leader: after running
+    it waits up to window seconds (or until max_batch calls joined), then
+    commits for everybody. Followers return once that commit is done, so a
+    call never returns before its changes are durable; a call that fails
+    raises its own error at once and is left out of the commit, and a
+    failed commit raises in every call of the group.
+    """
+
+    def __init__(self, database=None, window=0.002, max_batch=64):
+        """
+        Args:
+            database (str): Database path; defaults to DATABASE
+            window (float): Seconds a leader waits for more calls to join
+            max_batch (int): Calls after which the group commits at once
+        """
+        self.window = window
+        self.max_batch = max_batch
+        # Transactions are managed explicitly by the group
+        self.conn = sqlite3.connect(database or DATABASE, isolation_level=None,
+                                    check_same_thread=False)
+        self._lock = threading.Lock()
+        self._joined = threading.Condition(self._lock)
+        self._group = None
+        self.commits = 0
+        self.calls = 0
+
+    def run(self, func, args, kwargs):
+        """Runs func(conn, *args, **kwargs) and returns once its group has committed"""
+        with self._lock:
+            group = self._group
+            leader = group is None
+            if leader:
+                self.conn.execute("BEGIN IMMEDIATE")
+                group = self._group = _Group()
+            group.size += 1
+            self.calls += 1
+            if not leader:
+                with savepoint(self.conn):
+                    result = func(self.conn, *args, **kwargs)
+                if group.size >= self.max_batch:
+                    self._joined.notify_all()
+            else:
+                # Whatever happens to the leader's call, the group has to be
+                # committed and released, or its followers would wait forever
+                error = None
+                try:
+                    with savepoint(self.conn):
+                        result = func(self.conn, *args, **kwargs)
+                except Exception as e:
+                    # The leader still has to commit the others' changes
+                    error = e
+                finally:
+                    try:
+                        self._joined.wait_for(lambda: group.size >= self.max_batch,
+                                              timeout=self.window)
+                    finally:
+                        self._commit(group)
+                if error is not None:
+                    raise error
+        group.committed.wait()
+        if group.error is not None:
+            raise group.error
+        return result
+
+    def _commit(self, group):
+        """Commits group's transaction and wakes its followers, even if committing fails"""
+        self._group = None
+        try:
+            self.conn.execute("COMMIT")
+            self.commits += 1
+        except sqlite3.Error as e:
+            group.error = e
+            try:
+                self.conn.execute("ROLLBACK")
+            except sqlite3.Error:
+                # SQLite may have rolled back already
+                pass
+        finally:
+            group.committed.set()
+
+    def close(self):
+        self.conn.close()
+
+def enable_group_commit(database=None, window=0.002, max_batch=64):
+    """Routes with_db_connection calls through a shared GroupCommitter"""
+    global _group_committer
+    disable_group_commit()
+    _group_committer = GroupCommitter(database, window, max_batch)
+    return _group_committer
+
+def disable_group_commit():
+    """Goes back to one connection and one commit per call"""
+    global _group_committer
+    committer, _group_committer = _group_committer, None
+    if committer is not None:
+        committer.close()
+
 @with_db_connection 
 @transactional 
 def update_user_email(conn, user_id, new_email): 
@@ -39,4 +273,61 @@ def update_user_email(conn, user_id, new_email):
     cursor.execute("UPDATE users SET email = ? WHERE id = ?", (new_email, user_id)) 
 
 #### Update user's email with automatic transaction handling 
-update_user_email(user_id=1, new_email='Crawford_Cartwright@hotmail.com')
\ No newline at end of file
+update_user_email(user_id=1, new_email='Crawford_Cartwright@hotmail.com')
+
+def benchmark(updates=2000, threads=8):
+    """Prints updates/s for per-call commits, batch() and group commit"""
+    global DATABASE
+    import os
+    import tempfile
+
+    saved = DATABASE
+    with tempfile.TemporaryDirectory() as directory:
+        DATABASE = os.path.join(directory, 'benchmark.db')
+        conn = sqlite3.connect(DATABASE)
+        conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, email TEXT)")
+        conn.executemany("INSERT INTO users (id, email) VALUES (?, ?)",
+                         ((i, f"user{i}@example.com") for i in range(updates)))
+        conn.commit()
+        conn.close()
+
+        def timed(label, run):
+            started = time.perf_counter()
+            run()
+            elapsed = time.perf_counter() - started
+            print(f"{label:<32} {updates / elapsed:10.0f} updates/s")
+
+        def serial():
+            for i in range(updates):
+                update_user_email(user_id=i, new_email=f"serial{i}@example.com")
+
+        def batched():
+            with batch():
+                for i in range(updates):
+                    update_user_email(user_id=i, new_email=f"batch{i}@example.com")
+
+        counts = []
+
+        def grouped():
+            enable_group_commit(max_batch=threads)
+            try:
+                def worker(offset):
+                    for i in range(offset, updates, threads):
+                        update_user_email(user_id=i, new_email=f"group{i}@example.com")
+                workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+                for thread in workers:
+                    thread.start()
+                for thread in workers:
+                    thread.join()
+                counts.append((_group_committer.calls, _group_committer.commits))
+            finally:
+                disable_group_commit()
+
+        timed("commit per call", serial)
+        timed("batch()", batched)
+        timed(f"group commit, {threads} threads", grouped)
+        print(f"  {counts[0][0]} calls in {counts[0][1]} commits")
+    DATABASE = saved
+
+if __name__ == "__main__" and '--benchmark' in sys.argv:
+    benchmark()
@@ -1,9 +1,33 @@
 import time
 import sqlite3 
 import functools
+import asyncio
+import inspect
+import random
+import threading
+
+try:
+    import aiosqlite
+except ImportError:  # only needed to decorate async def functions
+    aiosqlite = None
 
 def with_db_connection(func):
-    """Decorator that automatically handles opening and closing database connections"""
+    """Decorator that automatically handles opening and closing database connections
+
+    async def functions get an aiosqlite connection and are awaited.
+    """
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            if aiosqlite is None:
+                raise ImportError("aiosqlite is required to decorate async def functions")
+            conn = await aiosqlite.connect('example.db')
+            try:
+                return await func(conn, *args, **kwargs)
+            finally:
+                await conn.close()
+        return async_wrapper
+
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
         # Open database connection
@@ -17,25 +41,122 @@ def with_db_connection(func):
             conn.close()
     return wrapper
 
-def retry_on_failure(retries=3, delay=2):
-    """Decorator that retries database operations if they fail due to transient errors"""
+class RetryBudget:
+    """Token bucket capping retries at a fraction of calls, process-wide
+
+    Every call deposits ratio tokens and every retry spends one, so when a
+    dependency is down retries add at most ratio extra load instead of
+    multiplying it; min_tokens lets an otherwise idle process still retry.
+    """
+
+    def __init__(self, ratio=0.2, min_tokens=10, max_tokens=100):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self.tokens = min_tokens
+        self.exhausted = 0
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self.tokens = min(self.tokens + self.ratio, self.max_tokens)
+
+    def withdraw(self):
+        """Takes a token for one retry; False when the budget is spent"""
+        with self._lock:
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            self.exhausted += 1
+            return False
+
+retry_budget = RetryBudget()
+
+# sqlite3 primary result codes for a busy or locked database
+SQLITE_BUSY = 5
+SQLITE_LOCKED = 6
+TRANSIENT_MESSAGES = ('database is locked', 'database is busy', 'database table is locked')
+
+def is_transient(error):
+    """Tells lock contention and timeouts, worth retrying, from permanent errors"""
+    if isinstance(error, sqlite3.OperationalError):
+        code = getattr(error, 'sqlite_errorcode', None)
+        if code is not None:
+            return code & 0xff in (SQLITE_BUSY, SQLITE_LOCKED)
+        message = str(error).lower()
+        return any(text in message for text in TRANSIENT_MESSAGES)
+    return isinstance(error, (TimeoutError, ConnectionError))
+
+def retry_on_failure(retries=3, delay=2, max_delay=30, backoff=2, deadline=None,
+                     retryable=is_transient, budget=None):
+    """Decorator that retries database operations if they fail due to transient errors
+
+    Waits are exponential with full jitter, a random time up to
+    min(max_delay, delay * backoff ** attempt), so contending callers spread
+    out instead of retrying in lockstep. Coroutine functions are retried with
+    asyncio.sleep instead of blocking the thread.
+
+    Args:
+        retries (int): Most attempts in total, at least 1
+        delay (float): Cap of the first wait in seconds
+        max_delay (float): Cap of any wait in seconds
+        backoff (float): Growth of the cap per attempt
+        deadline (float): Seconds after the first attempt past which no retry starts
+        retryable (callable): Tells whether an exception is worth retrying
+        budget (RetryBudget): Shared retry budget; defaults to retry_budget
+    """
+    if retries < 1:
+        # With no attempt the function would never run and None would come back
+        raise ValueError(f"retries must be at least 1, got {retries}")
+
+    def next_delay(attempt, error, started):
+        """Returns the seconds to wait before the next attempt, or None to give up"""
+        if not retryable(error):
+            print(f"Attempt {attempt + 1} failed: {error}. Not a transient error, not retrying.")
+            return None
+        if attempt >= retries - 1:
+            print(f"Attempt {attempt + 1} failed: {error}. No more retries.")
+            return None
+        wait = random.uniform(0, min(max_delay, delay * backoff ** attempt))
+        if deadline is not None:
+            remaining = deadline - (time.monotonic() - started)
+            if remaining <= 0:
+                print(f"Attempt {attempt + 1} failed: {error}. Deadline of {deadline}s reached.")
+                return None
+            wait = min(wait, remaining)
+        if not (budget or retry_budget).withdraw():
+            print(f"Attempt {attempt + 1} failed: {error}. Retry budget exhausted.")
+            return None
+        print(f"Attempt {attempt + 1} failed: {error}. Retrying in {wait:.2f} seconds...")
+        return wait
+
     def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                (budget or retry_budget).deposit()
+                started = time.monotonic()
+                for attempt in range(retries):
+                    try:
+                        return await func(*args, **kwargs)
+                    except Exception as e:
+                        wait = next_delay(attempt, e, started)
+                        if wait is None:
+                            raise
+                    await asyncio.sleep(wait)
+            return async_wrapper
+
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
-            last_exception = None
+            (budget or retry_budget).deposit()
+            started = time.monotonic()
             for attempt in range(retries):
                 try:
                     return func(*args, **kwargs)
                 except Exception as e:
-                    last_exception = e
-                    if attempt < retries - 1:  # Don't sleep on the last attempt
-                        print(f"Attempt {attempt + 1} failed: {e}. Retrying in {delay} seconds...")
-                        time.sleep(delay)
-                    else:
-                        print(f"Attempt {attempt + 1} failed: {e}. No more retries.")
-            
-            # If all retries failed, raise the last exception
-            raise last_exception
+                    wait = next_delay(attempt, e, started)
+                    if wait is None:
+                        raise
+                time.sleep(wait)
         return wrapper
     return decorator
 
@@ -1,9 +1,39 @@
 import time
 import sqlite3 
 import functools
+import asyncio
+import contextlib
+import inspect
+import itertools
+import re
+import sys
+import threading
+import weakref
+from collections import OrderedDict
+from concurrent.futures import Future
+
+try:
+    import aiosqlite
+except ImportError:  # only needed to decorate async def functions
+    aiosqlite = None
 
 def with_db_connection(func):
-    """Decorator that automatically handles opening and closing database connections"""
+    """Decorator that automatically handles opening and closing database connections
+
+    async def functions get an aiosqlite connection and are awaited.
+    """
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            if aiosqlite is None:
+                raise ImportError("aiosqlite is required to decorate async def functions")
+            conn = await aiosqlite.connect('example.db')
+            try:
+                return await func(conn, *args, **kwargs)
+            finally:
+                await conn.close()
+        return async_wrapper
+
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
         # Open database connection
@@ -17,24 +47,510 @@ def with_db_connection(func):
             conn.close()
     return wrapper
 
-query_cache = {}
+def result_size(value):
+    """Estimates the memory held by a query result in bytes"""
+    size = sys.getsizeof(value)
+    if isinstance(value, (list, tuple)):
+        size += sum(result_size(item) for item in value)
+    elif isinstance(value, dict):
+        size += sum(result_size(k) + result_size(v) for k, v in value.items())
+    return size
+
+def freeze(value):
+    """Turns bound parameters into a hashable cache key component"""
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, freeze(v)) for k, v in value.items()))
+    if isinstance(value, (set, frozenset)):
+        return frozenset(freeze(item) for item in value)
+    return value
+
+# Tables named after FROM or JOIN, including comma-separated FROM lists
+READ_TABLES = re.compile(
+    r'\b(?:FROM|JOIN)\s+((?:[\w."`\[\]]+(?:\s+(?:AS\s+)?\w+)?\s*,\s*)*[\w."`\[\]]+)',
+    re.IGNORECASE)
+# Table written by an INSERT, REPLACE, UPDATE, DELETE or schema change
+WRITE_TABLE = re.compile(
+    r'^\s*(?:INSERT(?:\s+OR\s+\w+)?\s+INTO|REPLACE\s+INTO|UPDATE(?:\s+OR\s+\w+)?'
+    r'|DELETE\s+FROM|DROP\s+TABLE(?:\s+IF\s+EXISTS)?|ALTER\s+TABLE)\s+([\w."`\[\]]+)',
+    re.IGNORECASE)
+
+def table_name(name):
+    """Normalizes a table reference: no quotes or schema, lower case"""
+    return name.strip('"`[]').split('.')[-1].strip('"`[]').lower()
+
+def query_tables(query):
+    """Returns the tables a SELECT reads, or None if none can be found"""
+    tables = set()
+    for match in READ_TABLES.finditer(query):
+        for reference in match.group(1).split(','):
+            tables.add(table_name(reference.split()[0]))
+    return frozenset(tables) or None
+
+def written_table(statement):
+    """Returns the table an SQL statement writes to, or None for reads"""
+    match = WRITE_TABLE.match(statement)
+    return table_name(match.group(1)) if match else None
+
+def database_name(conn):
+    """Returns the file backing the connection's main database"""
+    return main_database(conn, conn.execute("PRAGMA database_list"))
+
+async def async_database_name(conn):
+    """database_name() for aiosqlite connections"""
+    async with conn.execute("PRAGMA database_list") as cursor:
+        return main_database(conn, await cursor.fetchall())
+
+def main_database(conn, databases):
+    for _, name, path in databases:
+        if name == 'main':
+            # In-memory databases have no file; each one is distinct
+            return path or f":memory:{id(conn)}"
+    return None
+
+# Every QueryCache, so that committed writes can invalidate all of them
+caches = weakref.WeakSet()
+
+# Index key for entries whose tables are unknown; any write invalidates them
+ANY_TABLE = '*'
+
+class QueryCache:
+    """Thread-safe LRU cache of query results with per-entry TTL and a byte budget
+
+    Each entry records the tables its query read, and invalidate() drops the
+    entries depending on tables that were written. Only this file's
+    transactional calls invalidate() for you: writes made any other way
+    (2-transactional.py, another process, a plain commit) are not seen, and
+    the cached reads stay stale until their TTL runs out unless the writer
+    calls invalidate(database, tables) itself.
+    """
+
+    def __init__(self, max_entries=256, max_bytes=16 * 1024 * 1024, ttl=300):
+        """
+        Args:
+            max_entries (int): Most results kept at once
+            max_bytes (int): Most estimated result bytes kept at once
+            ttl (float): Seconds a result stays fresh; None keeps it until evicted
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (value, size, expires_at, stale_until, tables)
+        self._in_flight = {}  # key -> Future of the query computing it
+        self._by_table = {}  # (database, table) -> keys of entries reading it
+        self._versions = {}  # (database, table) -> writes committed so far
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.coalesced = 0
+        self.stale_hits = 0
+        caches.add(self)
+
+    def get(self, key):
+        """Returns (True, value) for a fresh entry, (False, None) otherwise"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return False, None
+            value, _, expires_at, stale_until, _ = entry
+            now = time.monotonic()
+            if expires_at is not None and expires_at <= now:
+                if stale_until <= now:
+                    self._remove(key)
+                    self.expirations += 1
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, value
+
+    def get_stale(self, key):
+        """Returns (True, value) for an expired entry still in its stale window"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[3] is None or entry[3] <= time.monotonic():
+                return False, None
+            self._entries.move_to_end(key)
+            self.stale_hits += 1
+            return True, entry[0]
+
+    def begin(self, key):
+        """Claims the computation of key for the calling thread
+
+        Returns:
+            tuple: (future, leader). The leader runs the query and passes the
+            outcome to finish(); everyone else waits on future.result(), which
+            returns the leader's result or raises its exception.
+        """
+        with self._lock:
+            future = self._in_flight.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return future, False
+            future = Future()
+            entry = self._entries.get(key)
+            if entry is not None and (entry[2] is None or entry[2] > time.monotonic()):
+                # Another leader stored the result since the caller's miss
+                future.set_result(entry[0])
+                return future, False
+            self._in_flight[key] = future
+            return future, True
+
+    def finish(self, key, future, result=None, error=None):
+        """Hands the leader's result or error to the callers waiting on key"""
+        with self._lock:
+            self._in_flight.pop(key, None)
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def version(self, database, tables):
+        """Returns a token that changes whenever one of the tables is written
+
+        Take it before running the query and pass it to set(), so that a result
+        read before a concurrent write commits is not cached after it.
+        """
+        with self._lock:
+            return self._version(database, tables)
+
+    def _version(self, database, tables):
+        if tables is None:
+            return self._versions.get((database, ANY_TABLE), 0)
+        return tuple(self._versions.get((database, table), 0) for table in sorted(tables))
+
+    def set(self, key, value, ttl=None, tables=None, version=None, stale_ttl=None):
+        """Stores value, evicting least recently used entries to stay in budget
+
+        Args:
+            key (tuple): Cache key, starting with the database name
+            tables (frozenset): Tables the result depends on; None for unknown
+            version: Token from version() taken before the query ran
+            stale_ttl (float): Seconds after expiry that get_stale() may still
+                serve the value while it is refreshed
+        """
+        size = result_size(value)
+        if size > self.max_bytes:
+            # Would evict everything else and still not fit
+            return
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        stale_until = expires_at + (stale_ttl or 0) if expires_at is not None else None
+        database = key[0]
+        with self._lock:
+            if version is not None and version != self._version(database, tables):
+                # A write committed while the query ran; the result may be stale
+                return
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, size, expires_at, stale_until, tables)
+            self._bytes += size
+            for table in tables or (ANY_TABLE,):
+                self._by_table.setdefault((database, table), set()).add(key)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def _remove(self, key):
+        _, size, _, _, tables = self._entries.pop(key)
+        self._bytes -= size
+        for table in tables or (ANY_TABLE,):
+            keys = self._by_table.get((key[0], table))
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_table[(key[0], table)]
+
+    def invalidate(self, database, tables):
+        """Drops the entries of database that read any of tables
+
+        Entries whose tables are unknown are dropped on every write.
+
+        Returns:
+            int: Entries dropped
+        """
+        with self._lock:
+            doomed = set(self._by_table.get((database, ANY_TABLE), ()))
+            for table in tables:
+                doomed.update(self._by_table.get((database, table), ()))
+                self._versions[(database, table)] = self._versions.get((database, table), 0) + 1
+            self._versions[(database, ANY_TABLE)] = self._versions.get((database, ANY_TABLE), 0) + 1
+            for key in doomed:
+                self._remove(key)
+            self.invalidations += len(doomed)
+            return len(doomed)
+
+    def clear(self):
+        """Drops every entry"""
+        with self._lock:
+            self._entries.clear()
+            self._by_table.clear()
+            self._bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        """Returns hit, miss, eviction and size counters"""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+                'coalesced': self.coalesced,
+                'stale_hits': self.stale_hits,
+                'in_flight': len(self._in_flight),
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+            }
+
+query_cache = QueryCache()
+
+def cache_query(func=None, *, cache=None, ttl=None, tables=None, single_flight=False,
+                stale_ttl=None):
+    """Decorator that caches query results by database, SQL query string and parameters
+
+    Use as @cache_query or @cache_query(ttl=60, cache=QueryCache(...)). The tables
+    a query reads are parsed from its FROM and JOIN clauses unless given in tables;
+    a transactional write to any of them invalidates the cached result.
+
+    With single_flight, concurrent misses for the same key run the query once:
+    the first caller computes it and the others wait for its result or error.
+    With stale_ttl as well, an expired result is served for stale_ttl more
+    seconds while a single caller refreshes it.
+
+    async def functions are awaited, and share the same cache, in-flight
+    queries included, with synchronous callers.
+    """
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            return async_cache_wrapper(func)
+
+        @functools.wraps(func)
+        def wrapper(conn, query, *args, **kwargs):
+            store = query_cache if cache is None else cache
+            database = database_name(conn)
+            # The same SQL with other parameters, or on another database, is another result
+            cache_key = (database, query, freeze(args), freeze(kwargs))
+            read_tables = frozenset(map(table_name, tables)) if tables else query_tables(query)
+
+            # Check if result is already cached
+            hit, result = store.get(cache_key)
+            if hit:
+                print(f"Cache hit for query: {query}")
+                return result
+
+            def load():
+                version = store.version(database, read_tables)
+                result = func(conn, query, *args, **kwargs)
+                store.set(cache_key, result, ttl, read_tables, version, stale_ttl)
+                return result
+
+            if not single_flight:
+                # If not cached, execute the function and cache the result
+                print(f"Cache miss for query: {query}")
+                return load()
+
+            future, leader = store.begin(cache_key)
+            if not leader:
+                if stale_ttl and not future.done():
+                    stale, result = store.get_stale(cache_key)
+                    if stale:
+                        print(f"Serving stale result while refreshing query: {query}")
+                        return result
+                print(f"Waiting for in-flight query: {query}")
+                return future.result()
+
+            print(f"Cache miss for query: {query}")
+            try:
+                result = load()
+            except BaseException as e:
+                store.finish(cache_key, future, error=e)
+                raise
+            store.finish(cache_key, future, result)
+            return result
+        return wrapper
+
+    def async_cache_wrapper(func):
+        @functools.wraps(func)
+        async def async_wrapper(conn, query, *args, **kwargs):
+            store = query_cache if cache is None else cache
+            database = await async_database_name(conn)
+            cache_key = (database, query, freeze(args), freeze(kwargs))
+            read_tables = frozenset(map(table_name, tables)) if tables else query_tables(query)
+
+            # The cache's lock is never held across an await, so the loop never blocks on it
+            hit, result = store.get(cache_key)
+            if hit:
+                print(f"Cache hit for query: {query}")
+                return result
+
+            async def load():
+                version = store.version(database, read_tables)
+                result = await func(conn, query, *args, **kwargs)
+                store.set(cache_key, result, ttl, read_tables, version, stale_ttl)
+                return result
+
+            if not single_flight:
+                print(f"Cache miss for query: {query}")
+                return await load()
+
+            future, leader = store.begin(cache_key)
+            if not leader:
+                if stale_ttl and not future.done():
+                    stale, result = store.get_stale(cache_key)
+                    if stale:
+                        print(f"Serving stale result while refreshing query: {query}")
+                        return result
+                print(f"Waiting for in-flight query: {query}")
+                return await asyncio.wrap_future(future)
+
+            print(f"Cache miss for query: {query}")
+            try:
+                result = await load()
+            except BaseException as e:
+                store.finish(cache_key, future, error=e)
+                raise
+            store.finish(cache_key, future, result)
+            return result
+        return async_wrapper
+
+    if func is not None:
+        return decorator(func)
+    return decorator
+
+# Unique savepoint names, so nested levels never release each other's
+_savepoint_ids = itertools.count()
+
+@contextlib.contextmanager
+def savepoint(conn):
+    """Runs a block in a SAVEPOINT: on error only the block's changes are undone"""
+    name = f"sp_{next(_savepoint_ids)}"
+    conn.execute(f"SAVEPOINT {name}")
+    try:
+        yield
+    except BaseException:
+        conn.execute(f"ROLLBACK TO {name}")
+        conn.execute(f"RELEASE {name}")
+        raise
+    conn.execute(f"RELEASE {name}")
+
+@contextlib.asynccontextmanager
+async def async_savepoint(conn):
+    """savepoint() for aiosqlite connections"""
+    name = f"sp_{next(_savepoint_ids)}"
+    await conn.execute(f"SAVEPOINT {name}")
+    try:
+        yield
+    except BaseException:
+        await conn.execute(f"ROLLBACK TO {name}")
+        await conn.execute(f"RELEASE {name}")
+        raise
+    await conn.execute(f"RELEASE {name}")
+
+# Tables written so far by the outermost transactional call on each
+# connection (keyed by id, as sqlite3 connections take no weak references)
+_written = {}
+
+def transactional(func):
+    """Decorator that commits or rolls back changes and invalidates cached reads
+
+    Statements are traced while func runs; once the commit succeeds, every
+    cached result that read a table written by them is dropped. Called while
+    a transaction is already open on conn, it runs in a SAVEPOINT instead: a
+    failure rolls back only this call, and the commit and invalidation are
+    left to the outer transactional call. When the transaction was opened
+    some other way, the tables are invalidated as soon as the savepoint is
+    released. async def functions are handled the same way on aiosqlite
+    connections.
+
+    This is the only writer the caches hear about; the transactional
+    decorator in 2-transactional.py commits without invalidating anything.
+    """
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(conn, *args, **kwargs):
+            if id(conn) in _written:
+                async with async_savepoint(conn):
+                    return await func(conn, *args, **kwargs)
+            written = _written[id(conn)] = set()
+
+            def trace(statement):
+                table = written_table(statement)
+                if table is not None:
+                    written.add(table)
+
+            await conn.set_trace_callback(trace)
+            try:
+                if conn.in_transaction:
+                    async with async_savepoint(conn):
+                        result = await func(conn, *args, **kwargs)
+                else:
+                    try:
+                        # Start the transaction explicitly, so nested calls see it open
+                        await conn.execute("BEGIN")
+                        result = await func(conn, *args, **kwargs)
+                        await conn.commit()
+                    except Exception:
+                        await conn.rollback()
+                        raise
+            finally:
+                await conn.set_trace_callback(None)
+                del _written[id(conn)]
+
+            if written:
+                database = await async_database_name(conn)
+                for cache in list(caches):
+                    cache.invalidate(database, written)
+            return result
+        return async_wrapper
 
-def cache_query(func):
-    """Decorator that caches query results based on the SQL query string"""
     @functools.wraps(func)
-    def wrapper(conn, query, *args, **kwargs):
-        # Use the query string as the cache key
-        cache_key = query
-        
-        # Check if result is already cached
-        if cache_key in query_cache:
-            print(f"Cache hit for query: {query}")
-            return query_cache[cache_key]
-        
-        # If not cached, execute the function and cache the result
-        print(f"Cache miss for query: {query}")
-        result = func(conn, query, *args, **kwargs)
-        query_cache[cache_key] = result
+    def wrapper(conn, *args, **kwargs):
+        if id(conn) in _written:
+            # The outer call traces these writes too
+            with savepoint(conn):
+                return func(conn, *args, **kwargs)
+        written = _written[id(conn)] = set()
+
+        def trace(statement):
+            table = written_table(statement)
+            if table is not None:
+                written.add(table)
+
+        conn.set_trace_callback(trace)
+        try:
+            if conn.in_transaction:
+                with savepoint(conn):
+                    result = func(conn, *args, **kwargs)
+            else:
+                try:
+                    # Start the transaction explicitly, so nested calls see it open
+                    conn.execute("BEGIN")
+                    result = func(conn, *args, **kwargs)
+                    # Commit if no exception occurred
+                    conn.commit()
+                except Exception as e:
+                    # Rollback if an exception occurred
+                    conn.rollback()
+                    raise e
+        finally:
+            conn.set_trace_callback(None)
+            del _written[id(conn)]
+
+        if written:
+            database = database_name(conn)
+            for cache in list(caches):
+                cache.invalidate(database, written)
         return result
     return wrapper
 
@@ -45,8 +561,18 @@ def fetch_users_with_cache(conn, query):
     cursor.execute(query)
     return cursor.fetchall()
 
+@with_db_connection
+@transactional
+def update_user_email(conn, user_id, new_email):
+    cursor = conn.cursor()
+    cursor.execute("UPDATE users SET email = ? WHERE id = ?", (new_email, user_id))
+
 #### First call will cache the result
 users = fetch_users_with_cache(query="SELECT * FROM users")
 
 #### Second call will use the cached result
-users_again = fetch_users_with_cache(query="SELECT * FROM users")
\ No newline at end of file
+users_again = fetch_users_with_cache(query="SELECT * FROM users")
+
+#### Committing a write to users invalidates the cached result
+update_user_email(user_id=1, new_email='Crawford_Cartwright@hotmail.com')
+users_updated = fetch_users_with_cache(query="SELECT * FROM users")
\ No newline at end of file
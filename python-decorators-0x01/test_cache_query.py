@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""Unit tests for QueryCache and single-flight caching in 4-cache_query.py"""
+
+import asyncio
+import contextlib
+import importlib
+import io
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+cq = directory = cwd = None
+
+
+def setUpModule():
+    """Import 4-cache_query.py next to an example.db it can run its demo on"""
+    global cq, directory, cwd
+    directory = tempfile.TemporaryDirectory()
+    cwd = os.getcwd()
+    os.chdir(directory.name)
+    conn = sqlite3.connect('example.db')
+    conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, email TEXT)")
+    conn.executemany("INSERT INTO users VALUES (?, ?)",
+                     ((i, f"user{i}@example.com") for i in range(10)))
+    conn.commit()
+    conn.close()
+    sys.path.insert(0, HERE)
+    with contextlib.redirect_stdout(io.StringIO()):
+        cq = importlib.import_module('4-cache_query')
+
+
+def tearDownModule():
+    os.chdir(cwd)
+    directory.cleanup()
+
+
+def wait_until(condition, timeout=5):
+    """Poll condition until it holds, failing after timeout seconds"""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not reached in time")
+        time.sleep(0.001)
+
+
+class FakeClock:
+    """Stands in for time.monotonic, moving only when advanced"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+class TestQueryCache(unittest.TestCase):
+    """Test cases for QueryCache eviction, expiry and accounting"""
+
+    def setUp(self):
+        self.clock = FakeClock()
+        clock = patch.object(cq.time, 'monotonic', self.clock)
+        clock.start()
+        self.addCleanup(clock.stop)
+
+    def test_evicts_least_recently_used_by_count(self):
+        """Test that going over max_entries evicts the least recently used entry"""
+        cache = cq.QueryCache(max_entries=2)
+        cache.set(('db', 'a'), 1)
+        cache.set(('db', 'b'), 2)
+        self.assertEqual(cache.get(('db', 'a')), (True, 1))
+        cache.set(('db', 'c'), 3)
+
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.get(('db', 'b')), (False, None))
+        self.assertEqual(cache.get(('db', 'a')), (True, 1))
+        self.assertEqual(cache.get(('db', 'c')), (True, 3))
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+    def test_evicts_to_stay_within_byte_budget(self):
+        """Test that entries are evicted oldest first to stay under max_bytes"""
+        rows = [(i, f"user{i}@example.com") for i in range(10)]
+        size = cq.result_size(rows)
+        cache = cq.QueryCache(max_entries=100, max_bytes=size * 2 + size // 2)
+        for index in range(3):
+            cache.set(('db', index), list(rows))
+
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.get(('db', 0)), (False, None))
+        self.assertLessEqual(cache.stats()['bytes'], cache.max_bytes)
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+        cache.set(('db', 'huge'), rows * 10)
+        self.assertEqual(cache.get(('db', 'huge')), (False, None))
+        self.assertEqual(len(cache), 2)
+
+    def test_entries_expire_after_ttl(self):
+        """Test that an entry is a hit until its TTL passes and is then dropped"""
+        cache = cq.QueryCache(ttl=10)
+        cache.set(('db', 'default'), 1)
+        cache.set(('db', 'short'), 2, ttl=1)
+        cache.set(('db', 'forever'), 3, ttl=None)
+        cache.ttl = None
+        cache.set(('db', 'no ttl'), 4)
+
+        self.clock.advance(5)
+        self.assertEqual(cache.get(('db', 'default')), (True, 1))
+        self.assertEqual(cache.get(('db', 'short')), (False, None))
+        self.clock.advance(6)
+        self.assertEqual(cache.get(('db', 'default')), (False, None))
+        self.assertEqual(cache.get(('db', 'no ttl')), (True, 4))
+        self.assertEqual(cache.stats()['expirations'], 2)
+        self.assertEqual(len(cache), 2)
+
+    def test_stale_window_after_ttl(self):
+        """Test that get_stale() serves an expired entry only within stale_ttl"""
+        cache = cq.QueryCache()
+        cache.set(('db', 'a'), 1, ttl=10, stale_ttl=5)
+
+        self.clock.advance(12)
+        self.assertEqual(cache.get(('db', 'a')), (False, None))
+        self.assertEqual(cache.get_stale(('db', 'a')), (True, 1))
+        self.clock.advance(5)
+        self.assertEqual(cache.get_stale(('db', 'a')), (False, None))
+        self.assertEqual(cache.get(('db', 'a')), (False, None))
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.stats()['stale_hits'], 1)
+        self.assertEqual(cache.stats()['expirations'], 1)
+
+    def test_size_and_stats_accounting(self):
+        """Test that counters and byte totals follow sets, hits, misses and removals"""
+        cache = cq.QueryCache()
+        users = [(1, 'a@example.com'), (2, 'b@example.com')]
+        orders = [(1, 1, 9.5)]
+        cache.set(('db', 'users'), users, tables=frozenset({'users'}))
+        cache.set(('db', 'orders'), orders, tables=frozenset({'orders'}))
+        cache.set(('db', 'users'), users, tables=frozenset({'users'}))
+        cache.get(('db', 'users'))
+        cache.get(('db', 'users'))
+        cache.get(('db', 'missing'))
+
+        stats = cache.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (2, 1))
+        self.assertEqual(stats['entries'], 2)
+        self.assertEqual(stats['bytes'], cq.result_size(users) + cq.result_size(orders))
+
+        self.assertEqual(cache.invalidate('db', {'users'}), 1)
+        self.assertEqual(cache.invalidate('other.db', {'orders'}), 0)
+        stats = cache.stats()
+        self.assertEqual(stats['invalidations'], 1)
+        self.assertEqual(stats['entries'], 1)
+        self.assertEqual(stats['bytes'], cq.result_size(orders))
+
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.stats()['bytes'], 0)
+
+
+class TestSingleFlight(unittest.TestCase):
+    """Test cases for cache_query(single_flight=True) across threads"""
+
+    callers = 20
+
+    def setUp(self):
+        self.path = os.path.join(directory.name, 'example.db')
+        self.cache = cq.QueryCache()
+        self.release = threading.Event()
+        self.calls = 0
+        stdout = patch('sys.stdout', new_callable=io.StringIO)
+        stdout.start()
+        self.addCleanup(stdout.stop)
+
+    def run_callers(self, fetch, query):
+        """Call fetch from self.callers threads; return their results or errors"""
+        outcomes = [None] * self.callers
+
+        def worker(index):
+            conn = sqlite3.connect(self.path)
+            try:
+                outcomes[index] = fetch(conn, query)
+            except Exception as e:
+                outcomes[index] = e
+            finally:
+                conn.close()
+
+        threads = [threading.Thread(target=worker, args=(index,), daemon=True)
+                   for index in range(self.callers)]
+        for thread in threads:
+            thread.start()
+        # Let the leader finish only once everyone else is waiting on it
+        wait_until(lambda: self.cache.stats()['coalesced'] == self.callers - 1)
+        self.release.set()
+        for thread in threads:
+            thread.join(5)
+            self.assertFalse(thread.is_alive())
+        return outcomes
+
+    def test_concurrent_misses_run_query_once(self):
+        """Test that callers missing the same key share one query"""
+        @cq.cache_query(cache=self.cache, single_flight=True)
+        def fetch(conn, query):
+            self.calls += 1
+            self.release.wait(5)
+            return conn.execute(query).fetchall()
+
+        outcomes = self.run_callers(fetch, "SELECT * FROM users")
+        self.assertEqual(self.calls, 1)
+        conn = sqlite3.connect(self.path)
+        expected = conn.execute("SELECT * FROM users").fetchall()
+        conn.close()
+        self.assertEqual(outcomes, [expected] * self.callers)
+        self.assertEqual(self.cache.stats()['in_flight'], 0)
+        self.assertEqual(len(self.cache), 1)
+
+    def test_leader_error_reaches_every_caller(self):
+        """Test that the leader's error is raised in every waiting caller"""
+        @cq.cache_query(cache=self.cache, single_flight=True)
+        def fetch(conn, query):
+            self.calls += 1
+            self.release.wait(5)
+            raise sqlite3.OperationalError("disk I/O error")
+
+        outcomes = self.run_callers(fetch, "SELECT * FROM users")
+        self.assertEqual(self.calls, 1)
+        for outcome in outcomes:
+            self.assertIsInstance(outcome, sqlite3.OperationalError)
+        self.assertEqual(len(self.cache), 0)
+        self.assertEqual(self.cache.stats()['in_flight'], 0)
+
+    def test_stale_result_served_while_refreshing(self):
+        """Test that an expired result is served by everyone but the refreshing caller"""
+        @cq.cache_query(cache=self.cache, ttl=0.01, stale_ttl=60, single_flight=True)
+        def fetch(conn, query):
+            self.calls += 1
+            if self.calls > 1:
+                self.release.wait(5)
+            return self.calls
+
+        conn = sqlite3.connect(self.path)
+        self.addCleanup(conn.close)
+        self.assertEqual(fetch(conn, "SELECT * FROM users"), 1)
+        time.sleep(0.02)
+
+        outcomes = self.run_callers(fetch, "SELECT * FROM users")
+        self.assertEqual(sorted(outcomes), [1] * (self.callers - 1) + [2])
+        self.assertEqual(self.calls, 2)
+
+
+class TestAsyncSingleFlight(unittest.IsolatedAsyncioTestCase):
+    """Test cases for single-flight caching of async def functions"""
+
+    async def test_concurrent_misses_run_query_once(self):
+        """Test that concurrent coroutines missing the same key share one query"""
+        if cq.aiosqlite is None:
+            self.skipTest("aiosqlite not installed")
+        cache = cq.QueryCache()
+        calls = []
+
+        @cq.cache_query(cache=cache, single_flight=True)
+        async def fetch(conn, query):
+            calls.append(query)
+            await asyncio.sleep(0.05)
+            async with conn.execute(query) as cursor:
+                return await cursor.fetchall()
+
+        conn = await cq.aiosqlite.connect(os.path.join(directory.name, 'example.db'))
+        try:
+            with patch('sys.stdout', new_callable=io.StringIO):
+                results = await asyncio.gather(
+                    *(fetch(conn, "SELECT id FROM users") for _ in range(10)))
+        finally:
+            await conn.close()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [[(i,) for i in range(10)]] * 10)
+        self.assertEqual(cache.stats()['coalesced'], 9)
+
+
+if __name__ == '__main__':
+    unittest.main()
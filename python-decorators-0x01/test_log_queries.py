@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""Unit tests for query extraction and row counting in 0-log_queries.py"""
+
+import importlib
+import io
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+lq = directory = cwd = None
+
+
+def setUpModule():
+    """Import 0-log_queries.py next to a users.db for the tests to query"""
+    global lq, directory, cwd
+    directory = tempfile.TemporaryDirectory()
+    cwd = os.getcwd()
+    os.chdir(directory.name)
+    conn = sqlite3.connect('users.db')
+    conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT, "
+                 "email TEXT, age INTEGER)")
+    conn.executemany("INSERT INTO users VALUES (?, ?, ?, ?)",
+                     ((i, f"user{i}", f"user{i}@example.com", 20 + i) for i in range(5)))
+    conn.commit()
+    conn.close()
+    sys.path.insert(0, HERE)
+    lq = importlib.import_module('0-log_queries')
+
+
+def tearDownModule():
+    os.chdir(cwd)
+    directory.cleanup()
+
+
+class TestLogQueries(unittest.TestCase):
+    """Test cases for what log_queries records"""
+
+    def setUp(self):
+        self.stream = io.StringIO()
+        lq.configure_profiler(stream=self.stream)
+        self.conn = sqlite3.connect(os.path.join(directory.name, 'users.db'))
+        self.conn.row_factory = sqlite3.Row
+
+    def tearDown(self):
+        self.conn.close()
+
+    def rows_recorded(self, statement):
+        lq.profiler.flush()
+        return next(row['rows'] for row in lq.profiler.report()
+                    if row['statement'] == statement)
+
+    def test_list_of_rows_counts_each_row(self):
+        """Test that a fetchall() result counts every row"""
+        @lq.log_queries
+        def fetch(conn, query):
+            return conn.execute(query).fetchall()
+
+        fetch(self.conn, "SELECT * FROM users")
+        self.assertEqual(self.rows_recorded("SELECT * FROM users"), 5)
+
+    def test_single_row_counts_once(self):
+        """Test that a fetchone() row counts as one row, not one per column"""
+        @lq.log_queries
+        def fetch_one(conn, query, params):
+            return tuple(conn.execute(query, params).fetchone())
+
+        @lq.log_queries
+        def fetch_row(conn, query, params):
+            return conn.execute(query, params).fetchone()
+
+        fetch_one(self.conn, "SELECT * FROM users WHERE id = ?", (1,))
+        fetch_row(self.conn, "SELECT * FROM users WHERE id = ?", (2,))
+        fetch_row(self.conn, "SELECT * FROM users WHERE id = ?", (99,))
+        self.assertEqual(self.rows_recorded("SELECT * FROM users WHERE id = ?"), 2)
+
+    def test_query_found_by_name_or_position(self):
+        """Test that the SQL is taken from a 'query' or 'sql' parameter"""
+        signature = lq.inspect.signature(lambda conn, sql, params=None: None)
+        self.assertEqual(lq.extract_query(signature, (self.conn, "SELECT 1", (2,)), {}),
+                         ("SELECT 1", (2,)))
+        self.assertEqual(lq.extract_query(signature, (self.conn,), {'sql': "SELECT 1"}),
+                         ("SELECT 1", None))
+
+    def test_other_strings_are_not_sql(self):
+        """Test that a call without a query parameter is not profiled"""
+        @lq.log_queries
+        def find_user(conn, name):
+            return conn.execute("SELECT * FROM users WHERE name = ?", (name,)).fetchone()
+
+        self.assertEqual(find_user(self.conn, 'user1')['id'], 1)
+        lq.profiler.flush()
+        self.assertEqual(lq.profiler.report(), [])
+        self.assertEqual(self.stream.getvalue(), '')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""Unit tests for retry_on_failure in 3-retry_on_failure.py"""
+
+import contextlib
+import importlib
+import io
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+from unittest.mock import AsyncMock, patch
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+rr = directory = cwd = None
+
+
+def setUpModule():
+    """Import 3-retry_on_failure.py next to an example.db it can run its demo on"""
+    global rr, directory, cwd
+    directory = tempfile.TemporaryDirectory()
+    cwd = os.getcwd()
+    os.chdir(directory.name)
+    conn = sqlite3.connect('example.db')
+    conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, email TEXT)")
+    conn.commit()
+    conn.close()
+    sys.path.insert(0, HERE)
+    with contextlib.redirect_stdout(io.StringIO()):
+        rr = importlib.import_module('3-retry_on_failure')
+
+
+def tearDownModule():
+    os.chdir(cwd)
+    directory.cleanup()
+
+
+class FakeClock:
+    """Stands in for time.monotonic and time.sleep; sleeping moves the clock"""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class TestRetryOnFailure(unittest.TestCase):
+    """Test cases for which failures are retried, and for how long"""
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.calls = 0
+        for patcher in (patch.object(rr.time, 'monotonic', self.clock),
+                        patch.object(rr.time, 'sleep', self.clock.sleep),
+                        # Always wait the longest the jitter allows
+                        patch.object(rr.random, 'uniform', lambda low, high: high),
+                        patch('sys.stdout', new_callable=io.StringIO)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def failing(self, error, successes_after=None):
+        """Returns a function raising error, then succeeding after that many calls"""
+        def func():
+            self.calls += 1
+            if successes_after is not None and self.calls > successes_after:
+                return self.calls
+            raise error
+        return func
+
+    def test_transient_errors_are_retried(self):
+        """Test that a locked database is retried until the call succeeds"""
+        budget = rr.RetryBudget()
+        func = rr.retry_on_failure(retries=3, delay=1, budget=budget)(
+            self.failing(sqlite3.OperationalError("database is locked"), successes_after=2))
+
+        self.assertEqual(func(), 3)
+        self.assertEqual(self.clock.sleeps, [1, 2])
+        self.assertAlmostEqual(budget.tokens, 10 + budget.ratio - 2)
+
+    def test_non_transient_errors_are_not_retried(self):
+        """Test that errors such as ValueError are raised on the first attempt"""
+        for error in (ValueError("bad input"),
+                      sqlite3.OperationalError("no such table: users"),
+                      sqlite3.IntegrityError("UNIQUE constraint failed")):
+            with self.subTest(error=error):
+                self.calls = 0
+                func = rr.retry_on_failure(retries=5, delay=1,
+                                           budget=rr.RetryBudget())(self.failing(error))
+                with self.assertRaises(type(error)):
+                    func()
+                self.assertEqual(self.calls, 1)
+        self.assertEqual(self.clock.sleeps, [])
+
+    def test_last_error_raised_when_attempts_run_out(self):
+        """Test that retries counts attempts and the last error is raised"""
+        func = rr.retry_on_failure(retries=3, delay=1, budget=rr.RetryBudget())(
+            self.failing(TimeoutError("timed out")))
+        with self.assertRaises(TimeoutError):
+            func()
+        self.assertEqual(self.calls, 3)
+        self.assertEqual(len(self.clock.sleeps), 2)
+
+    def test_exhausted_budget_refuses_retries(self):
+        """Test that retries stop once the shared budget has no tokens left"""
+        budget = rr.RetryBudget(ratio=0, min_tokens=1)
+        func = rr.retry_on_failure(retries=5, delay=1, budget=budget)(
+            self.failing(sqlite3.OperationalError("database is locked")))
+
+        with self.assertRaises(sqlite3.OperationalError):
+            func()
+        self.assertEqual(self.calls, 2)
+        with self.assertRaises(sqlite3.OperationalError):
+            func()
+        self.assertEqual(self.calls, 3)
+        self.assertEqual(budget.exhausted, 2)
+        self.assertEqual(len(self.clock.sleeps), 1)
+
+    def test_deadline_stops_retrying(self):
+        """Test that no retry starts after the deadline, and waits are cut to fit it"""
+        func = rr.retry_on_failure(retries=10, delay=4, backoff=1, deadline=10,
+                                   budget=rr.RetryBudget())(
+            self.failing(ConnectionError("connection reset")))
+
+        with self.assertRaises(ConnectionError):
+            func()
+        self.assertEqual(self.clock.sleeps, [4, 4, 2])
+        self.assertEqual(self.calls, 4)
+
+    def test_retries_below_one_rejected(self):
+        """Test that retries < 1 raises ValueError when decorating"""
+        for retries in (0, -1):
+            with self.subTest(retries=retries):
+                with self.assertRaises(ValueError):
+                    rr.retry_on_failure(retries=retries)
+
+
+class TestAsyncRetryOnFailure(unittest.IsolatedAsyncioTestCase):
+    """Test cases for retrying async def functions"""
+
+    async def test_retries_with_asyncio_sleep(self):
+        """Test that coroutines are retried on transient errors with asyncio.sleep"""
+        calls = []
+
+        @rr.retry_on_failure(retries=3, delay=1, budget=rr.RetryBudget())
+        async def fetch(error):
+            calls.append(error)
+            if len(calls) < 3 or isinstance(error, ValueError):
+                raise error
+            return len(calls)
+
+        with patch.object(rr.asyncio, 'sleep', new_callable=AsyncMock) as sleep, \
+                patch('sys.stdout', new_callable=io.StringIO):
+            self.assertEqual(await fetch(sqlite3.OperationalError("database is locked")), 3)
+            self.assertEqual(sleep.await_count, 2)
+            calls.clear()
+            with self.assertRaises(ValueError):
+                await fetch(ValueError("bad input"))
+            self.assertEqual(len(calls), 1)
+            self.assertEqual(sleep.await_count, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""Unit tests for savepoint nesting and group commit in 2-transactional.py"""
+
+import contextlib
+import importlib
+import io
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import unittest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+tx = directory = cwd = None
+
+
+def setUpModule():
+    """Import 2-transactional.py next to an example.db it can run its demo on"""
+    global tx, directory, cwd
+    directory = tempfile.TemporaryDirectory()
+    cwd = os.getcwd()
+    os.chdir(directory.name)
+    create_users('example.db')
+    sys.path.insert(0, HERE)
+    with contextlib.redirect_stdout(io.StringIO()):
+        tx = importlib.import_module('2-transactional')
+
+
+def tearDownModule():
+    os.chdir(cwd)
+    directory.cleanup()
+
+
+def create_users(path, count=10):
+    """Create a users table whose emails are user<id>@example.com"""
+    conn = sqlite3.connect(path)
+    conn.execute("DROP TABLE IF EXISTS users")
+    conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, email TEXT)")
+    conn.executemany("INSERT INTO users VALUES (?, ?)",
+                     ((i, f"user{i}@example.com") for i in range(count)))
+    conn.commit()
+    conn.close()
+
+
+def email(path, user_id):
+    """Read a user's email on a fresh connection, i.e. as committed"""
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute("SELECT email FROM users WHERE id = ?",
+                            (user_id,)).fetchone()[0]
+    finally:
+        conn.close()
+
+
+def set_email(conn, user_id, new_email):
+    conn.execute("UPDATE users SET email = ? WHERE id = ?", (new_email, user_id))
+
+
+class TestSavepointNesting(unittest.TestCase):
+    """Test cases for nested transactional calls"""
+
+    def setUp(self):
+        self.path = os.path.join(directory.name, 'nesting.db')
+        create_users(self.path)
+        self.conn = sqlite3.connect(self.path)
+        self.update = tx.transactional(set_email)
+
+    def tearDown(self):
+        self.conn.close()
+
+    def test_inner_failure_rolls_back_only_inner_call(self):
+        """Test that a failed nested call leaves the outer call's changes"""
+        @tx.transactional
+        def fail(conn):
+            set_email(conn, 2, 'inner')
+            raise ValueError("inner")
+
+        @tx.transactional
+        def outer(conn):
+            self.update(conn, 1, 'outer')
+            with self.assertRaises(ValueError):
+                fail(conn)
+
+        outer(self.conn)
+        self.assertEqual(email(self.path, 1), 'outer')
+        self.assertEqual(email(self.path, 2), 'user2@example.com')
+
+    def test_outer_failure_rolls_back_inner_calls(self):
+        """Test that only the outermost call commits"""
+        @tx.transactional
+        def outer(conn):
+            self.update(conn, 1, 'inner')
+            self.assertEqual(email(self.path, 1), 'user1@example.com')
+            raise KeyError("outer")
+
+        with self.assertRaises(KeyError):
+            outer(self.conn)
+        self.assertFalse(self.conn.in_transaction)
+        self.assertEqual(email(self.path, 1), 'user1@example.com')
+
+    def test_batch_commits_successful_calls_once(self):
+        """Test that batch() shares one commit and skips failed calls"""
+        @tx.transactional
+        def fail(conn):
+            set_email(conn, 3, 'failed')
+            raise ValueError("failed")
+
+        update = tx.with_db_connection(self.update)
+        with tx.batch(self.path) as conn:
+            update(4, 'batched')
+            with self.assertRaises(ValueError):
+                fail(conn)
+            self.assertEqual(email(self.path, 4), 'user4@example.com')
+        self.assertEqual(email(self.path, 4), 'batched')
+        self.assertEqual(email(self.path, 3), 'user3@example.com')
+
+
+class FailingCommit:
+    """Connection whose COMMIT and ROLLBACK both fail"""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __getattr__(self, name):
+        return getattr(self.conn, name)
+
+    def execute(self, sql, *args):
+        if sql in ("COMMIT", "ROLLBACK"):
+            raise sqlite3.OperationalError(f"{sql} failed")
+        return self.conn.execute(sql, *args)
+
+
+class TestGroupCommit(unittest.TestCase):
+    """Test cases for GroupCommitter"""
+
+    def setUp(self):
+        self.path = os.path.join(directory.name, 'group.db')
+        create_users(self.path, 64)
+        self.update = tx.transactional(set_email)
+
+    def run_threads(self, committer, calls, timeout=10):
+        """Run each (func, args) call on its own thread; return their outcomes"""
+        outcomes = [None] * len(calls)
+        start = threading.Barrier(len(calls))
+
+        def worker(index, func, args):
+            start.wait()
+            try:
+                outcomes[index] = committer.run(func, args, {})
+            except BaseException as e:
+                outcomes[index] = e
+
+        threads = [threading.Thread(target=worker, args=(index, func, args), daemon=True)
+                   for index, (func, args) in enumerate(calls)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout)
+            self.assertFalse(thread.is_alive(), "a group commit call never returned")
+        return outcomes
+
+    def test_calls_share_commits(self):
+        """Test that concurrent calls are committed in fewer commits"""
+        committer = tx.GroupCommitter(self.path, window=0.05, max_batch=8)
+        self.addCleanup(committer.close)
+
+        def update_and_read(conn, user_id):
+            self.update(conn, user_id, f"group{user_id}")
+            return user_id
+
+        outcomes = self.run_threads(committer, [(update_and_read, (i,)) for i in range(32)])
+        self.assertEqual(outcomes, list(range(32)))
+        self.assertEqual(committer.calls, 32)
+        self.assertLess(committer.commits, 32)
+        for i in range(32):
+            self.assertEqual(email(self.path, i), f"group{i}")
+
+    def test_call_returns_after_commit(self):
+        """Test that a call's change is visible to other connections once it returns"""
+        committer = tx.GroupCommitter(self.path, window=0.05, max_batch=4)
+        self.addCleanup(committer.close)
+
+        def update(conn, user_id):
+            self.update(conn, user_id, f"durable{user_id}")
+
+        seen = []
+
+        def update_then_read(user_id):
+            committer.run(update, (user_id,), {})
+            seen.append(email(self.path, user_id) == f"durable{user_id}")
+
+        threads = [threading.Thread(target=update_then_read, args=(i,)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(10)
+        self.assertEqual(seen, [True] * 4)
+
+    def test_failed_call_is_left_out(self):
+        """Test that a failing call raises its own error and the others commit"""
+        committer = tx.GroupCommitter(self.path, window=0.05, max_batch=4)
+        self.addCleanup(committer.close)
+
+        def fail(conn, user_id):
+            self.update(conn, user_id, 'failed')
+            raise ValueError(user_id)
+
+        def update(conn, user_id):
+            self.update(conn, user_id, f"ok{user_id}")
+
+        outcomes = self.run_threads(
+            committer, [(fail, (0,)), (update, (1,)), (update, (2,)), (fail, (3,))])
+        self.assertIsInstance(outcomes[0], ValueError)
+        self.assertIsInstance(outcomes[3], ValueError)
+        self.assertEqual([email(self.path, i) for i in range(4)],
+                         ['user0@example.com', 'ok1', 'ok2', 'user3@example.com'])
+
+    def test_failed_commit_releases_every_call(self):
+        """Test that followers return when both COMMIT and ROLLBACK fail"""
+        committer = tx.GroupCommitter(self.path, window=0.2, max_batch=4)
+        committer.conn = FailingCommit(committer.conn)
+        self.addCleanup(committer.close)
+
+        def update(conn, user_id):
+            self.update(conn, user_id, f"lost{user_id}")
+
+        outcomes = self.run_threads(committer, [(update, (i,)) for i in range(4)])
+        for outcome in outcomes:
+            self.assertIsInstance(outcome, sqlite3.OperationalError)
+        self.assertIsNone(committer._group)
+
+    def test_leader_base_exception_ends_group(self):
+        """Test that a leader interrupted by a BaseException still commits its group"""
+        class Interrupted(BaseException):
+            pass
+
+        committer = tx.GroupCommitter(self.path, window=0.01, max_batch=2)
+        self.addCleanup(committer.close)
+
+        def interrupted(conn, user_id):
+            self.update(conn, user_id, 'interrupted')
+            raise Interrupted()
+
+        def update(conn, user_id):
+            self.update(conn, user_id, f"after{user_id}")
+
+        with self.assertRaises(Interrupted):
+            committer.run(interrupted, (0,), {})
+        self.assertIsNone(committer._group)
+        outcomes = self.run_threads(committer, [(update, (1,))], timeout=5)
+        self.assertEqual(outcomes, [None])
+        self.assertEqual(email(self.path, 0), 'user0@example.com')
+        self.assertEqual(email(self.path, 1), 'after1')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""Unit tests for the connection pools in 1-with_db_connection.py"""
+
+import contextlib
+import importlib
+import io
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+wc = directory = cwd = None
+
+
+def setUpModule():
+    """Import 1-with_db_connection.py next to an example.db it can run its demo on"""
+    global wc, directory, cwd
+    directory = tempfile.TemporaryDirectory()
+    cwd = os.getcwd()
+    os.chdir(directory.name)
+    conn = sqlite3.connect('example.db')
+    conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, email TEXT)")
+    conn.executemany("INSERT INTO users VALUES (?, ?)",
+                     ((i, f"user{i}@example.com") for i in range(5)))
+    conn.commit()
+    conn.close()
+    sys.path.insert(0, HERE)
+    with contextlib.redirect_stdout(io.StringIO()):
+        wc = importlib.import_module('1-with_db_connection')
+
+
+def tearDownModule():
+    wc.configure_pool()
+    wc.get_pool().close()
+    os.chdir(cwd)
+    directory.cleanup()
+
+
+class TestConnectionPool(unittest.TestCase):
+    """Test cases for checking sqlite3 connections out of ConnectionPool"""
+
+    def setUp(self):
+        self.path = os.path.join(directory.name, 'example.db')
+        self.pool = wc.ConnectionPool(self.path, max_size=1, timeout=0.05)
+        self.addCleanup(self.pool.close)
+
+    def test_released_connection_is_reused(self):
+        """Test that a returned connection is handed to the next caller"""
+        conn = self.pool.acquire()
+        self.pool.release(conn)
+        self.assertIs(self.pool.acquire(), conn)
+        self.pool.release(conn)
+
+        stats = self.pool.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+        self.assertEqual(stats['idle'], 1)
+
+    def test_release_resets_settings(self):
+        """Test that row_factory, text_factory and callbacks do not leak to the next caller"""
+        traced, progress = [], []
+        first = self.pool.acquire()
+        first.row_factory = sqlite3.Row
+        first.text_factory = bytes
+        first.isolation_level = None
+        first.set_trace_callback(traced.append)
+        # Callbacks that let the health check through but would break users reads
+        first.set_authorizer(lambda action, *args: sqlite3.SQLITE_DENY
+                             if action == sqlite3.SQLITE_READ else sqlite3.SQLITE_OK)
+        first.set_progress_handler(lambda: progress.append(1), 1)
+        self.pool.release(first)
+
+        conn = self.pool.acquire()
+        try:
+            self.assertIs(conn, first)
+            self.assertIsNone(conn.row_factory)
+            self.assertIs(conn.text_factory, str)
+            self.assertEqual(conn.isolation_level, '')
+            self.assertEqual(conn.execute("SELECT email FROM users WHERE id = 1").fetchone(),
+                             ('user1@example.com',))
+            self.assertEqual(traced, [])
+            self.assertEqual(progress, [])
+        finally:
+            self.pool.release(conn)
+
+    def test_release_rolls_back_uncommitted_changes(self):
+        """Test that changes the caller did not commit are rolled back on return"""
+        conn = self.pool.acquire()
+        conn.execute("DELETE FROM users")
+        self.pool.release(conn)
+
+        conn = self.pool.acquire()
+        try:
+            self.assertEqual(conn.execute("SELECT COUNT(*) FROM users").fetchone(), (5,))
+        finally:
+            self.pool.release(conn)
+
+    def test_failed_connect_releases_slot(self):
+        """Test that a connection that cannot be opened does not use up a slot"""
+        with patch.object(self.pool, '_connect',
+                          side_effect=sqlite3.OperationalError("unable to open database file")):
+            for _ in range(3):
+                with self.assertRaises(sqlite3.OperationalError):
+                    self.pool.acquire()
+        conn = self.pool.acquire()
+        self.pool.release(conn)
+        self.assertEqual(self.pool.stats()['misses'], 4)
+
+    def test_broken_connection_discarded(self):
+        """Test that an idle connection failing its health check is replaced"""
+        conn = self.pool.acquire()
+        self.pool.release(conn)
+        conn.close()
+
+        fresh = self.pool.acquire()
+        self.pool.release(fresh)
+        self.assertIsNot(fresh, conn)
+        stats = self.pool.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['discarded']), (0, 2, 1))
+
+    def test_exhausted_pool_times_out(self):
+        """Test that acquire() gives up after timeout when every connection is out"""
+        conn = self.pool.acquire()
+        try:
+            with self.assertRaises(TimeoutError):
+                self.pool.acquire()
+        finally:
+            self.pool.release(conn)
+        self.pool.release(self.pool.acquire())
+        self.assertEqual(self.pool.stats()['waits'], 0)
+
+    def test_decorator_returns_connection_on_error(self):
+        """Test that with_db_connection hands the connection back when the function raises"""
+        wc.configure_pool(self.path, max_size=1, timeout=0.05)
+        self.addCleanup(wc.configure_pool)
+
+        @wc.with_db_connection
+        def fail(conn):
+            conn.execute("DELETE FROM users")
+            raise RuntimeError("boom")
+
+        @wc.with_db_connection
+        def count(conn):
+            return conn.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+
+        with self.assertRaises(RuntimeError):
+            fail()
+        self.assertEqual(count(), 5)
+        stats = wc.get_pool().stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['idle']), (1, 1, 1))
+
+
+class TestAsyncConnectionPool(unittest.IsolatedAsyncioTestCase):
+    """Test cases for checking aiosqlite connections out of AsyncConnectionPool"""
+
+    async def asyncSetUp(self):
+        if wc.aiosqlite is None:
+            self.skipTest("aiosqlite not installed")
+        self.pool = wc.AsyncConnectionPool(os.path.join(directory.name, 'example.db'),
+                                           max_size=1, timeout=0.05)
+        self.addAsyncCleanup(self.pool.close)
+
+    async def test_released_connection_is_reused(self):
+        """Test that a returned connection is handed to the next caller"""
+        conn = await self.pool.acquire()
+        await self.pool.release(conn)
+        self.assertIs(await self.pool.acquire(), conn)
+        await self.pool.release(conn)
+
+        stats = self.pool.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['idle']), (1, 1, 1))
+
+    async def test_release_resets_settings(self):
+        """Test that row_factory and text_factory do not leak to the next caller"""
+        conn = await self.pool.acquire()
+        conn.row_factory = wc.aiosqlite.Row
+        conn.text_factory = bytes
+        await conn.execute("DELETE FROM users")
+        await self.pool.release(conn)
+
+        conn = await self.pool.acquire()
+        try:
+            self.assertIsNone(conn.row_factory)
+            self.assertIs(conn.text_factory, str)
+            async with conn.execute("SELECT COUNT(*) FROM users") as cursor:
+                self.assertEqual(await cursor.fetchone(), (5,))
+        finally:
+            await self.pool.release(conn)
+
+    async def test_failed_connect_releases_slot(self):
+        """Test that a connection that cannot be opened does not use up a slot"""
+        with patch.object(wc.aiosqlite, 'connect',
+                          side_effect=sqlite3.OperationalError("unable to open database file")):
+            for _ in range(3):
+                with self.assertRaises(sqlite3.OperationalError):
+                    await self.pool.acquire()
+        conn = await self.pool.acquire()
+        await self.pool.release(conn)
+        self.assertEqual(self.pool.stats()['misses'], 4)
+
+    async def test_exhausted_pool_times_out(self):
+        """Test that acquire() gives up after timeout without blocking the loop"""
+        conn = await self.pool.acquire()
+        try:
+            with self.assertRaises(TimeoutError):
+                await self.pool.acquire()
+        finally:
+            await self.pool.release(conn)
+
+    async def test_release_after_close_discards(self):
+        """Test that a connection returned to a closed pool is closed, not kept"""
+        conn = await self.pool.acquire()
+        await self.pool.close()
+        await self.pool.release(conn)
+        stats = self.pool.stats()
+        self.assertEqual((stats['idle'], stats['discarded']), (0, 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,22 +3,133 @@
 Generator that streams rows from an SQL database one by one
 """
 
+import checkpoint as checkpoints
 import seed
 
 
-def stream_users():
+def stream_users(fetch_size=None, checkpoint=None, checkpoint_every=10000,
+                 resume_from=None, on_checkpoint=None, row_format='dict'):
     """
     Generator function that yields rows one by one from the user_data table.
     Uses yield to create a generator that fetches rows from the database.
+
+    Args:
+        fetch_size (int): When given, read fetch_size rows per fetchmany()
+            call instead of one row per fetch. Both ways read through
+            mysql-connector's default unbuffered cursor, so client memory
+            stays flat either way; batching only cuts per-row fetch overhead
+        checkpoint: Store with load() and save(token), such as
+            checkpoint.FileCheckpoint or checkpoint.SQLiteCheckpoint.
+            The scan resumes after its saved token and saves a new one
+            every checkpoint_every rows
+        checkpoint_every (int): Rows between checkpoint tokens
+        resume_from (str): Token to resume after, overriding the store
+        on_checkpoint (callable): Called with each new token
+        row_format (str): 'dict' for a dict per row, 'tuple' for plain
+            tuples, or 'record' for namedtuples sharing one type per query
     """
-    connection = seed.connect_to_prodev()
-    if connection:
-        cursor = connection.cursor(dictionary=True)
-        cursor.execute("SELECT * FROM user_data")
-        
-        # Yield each row one by one
-        for row in cursor:
-            yield row
-        
-        cursor.close()
-        connection.close()
\ No newline at end of file
+    if checkpoint or resume_from or on_checkpoint:
+        yield from _stream_resumable(fetch_size or 1000, checkpoint,
+                                     checkpoint_every, resume_from,
+                                     on_checkpoint, row_format)
+        return
+
+    if fetch_size is not None:
+        yield from _stream_unbuffered(fetch_size, row_format)
+        return
+
+    with seed.pooled_connection() as connection:
+        if connection:
+            cursor = seed.row_cursor(connection, row_format)
+            cursor.execute("SELECT * FROM user_data")
+            make_row = seed.row_maker(cursor, row_format)
+            
+            # Yield each row one by one
+            for row in cursor:
+                yield make_row(row) if make_row else row
+            
+            cursor.close()
+
+
+def _stream_unbuffered(fetch_size, row_format='dict'):
+    """
+    Yield user_data rows from an unbuffered cursor, fetch_size at a time.
+
+    The cursor is the same unbuffered kind the default path uses; the
+    difference is that rows are fetched in blocks rather than one by one.
+    """
+    with seed.pooled_connection() as connection:
+        if not connection:
+            return
+        cursor = seed.row_cursor(connection, row_format, buffered=False)
+        try:
+            cursor.execute("SELECT * FROM user_data")
+            make_row = seed.row_maker(cursor, row_format)
+            while True:
+                rows = cursor.fetchmany(fetch_size)
+                if not rows:
+                    break
+                if make_row:
+                    rows = map(make_row, rows)
+                for row in rows:
+                    yield row
+        finally:
+            # After an early close the rest of the result is still pending.
+            # Rather than draining it over the network, leave it unread so
+            # the pool drops the connection, which ends the query server-side.
+            if not connection.unread_result:
+                cursor.close()
+
+
+
+def _stream_resumable(fetch_size, store, every, resume_from, on_checkpoint,
+                      row_format='dict'):
+    """
+    Yield user_data rows in user_id order, starting after the resume token
+    and emitting a token for the last finished row every `every` rows.
+
+    A token is only emitted once the consumer asks for the next row, so it
+    never covers a row that was still being processed when the job died.
+    """
+    if resume_from is None and store is not None:
+        resume_from = store.load()
+    last_seen = checkpoints.decode_token(resume_from) if resume_from else None
+
+    def emit(user_id):
+        token = checkpoints.encode_token(user_id)
+        if store is not None:
+            store.save(token)
+        if on_checkpoint is not None:
+            on_checkpoint(token)
+
+    with seed.pooled_connection() as connection:
+        if not connection:
+            return
+        cursor = seed.row_cursor(connection, row_format, buffered=False)
+        try:
+            if last_seen is None:
+                cursor.execute("SELECT * FROM user_data ORDER BY user_id")
+            else:
+                cursor.execute(
+                    "SELECT * FROM user_data WHERE user_id > %s "
+                    "ORDER BY user_id", (last_seen,))
+            make_row = seed.row_maker(cursor, row_format)
+            user_id = seed.column_getter(cursor, row_format, 'user_id')
+
+            count = 0
+            last_done = None
+            while True:
+                rows = cursor.fetchmany(fetch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield make_row(row) if make_row else row
+                    last_done = user_id(row)
+                    count += 1
+                    if count % every == 0:
+                        emit(last_done)
+            if last_done is not None and count % every:
+                emit(last_done)
+        finally:
+            if not connection.unread_result:
+                cursor.close()
@@ -3,32 +3,298 @@
 Batch processing for large data using generators
 """
 
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import columnar
+import pipeline
 import seed
 
+# Hex digits of the user_id prefix used as partition boundaries
+PARTITION_KEY_DIGITS = 4
+
+_DONE = object()
 
-def stream_users_in_batches(batch_size):
+
+class AdaptiveBatch(list):
+    """
+    Batch of rows from an adaptive scan.
+
+    Attributes:
+        fetch_size (int): Batch size requested from the cursor
+        latency (float): Seconds the fetch took
+        nbytes (int): Estimated in-memory size of the rows
+    """
+    fetch_size = None
+    latency = None
+    nbytes = None
+
+
+class AdaptiveColumns(dict):
+    """Columnar batch from an adaptive scan, with AdaptiveBatch's attributes"""
+    fetch_size = None
+    latency = None
+    nbytes = None
+
+
+class BatchSizer:
+    """
+    Chooses the next fetchmany size from the last batch's latency and size.
+
+    The size is scaled toward whichever target is tighter, at most doubling
+    or halving per batch, and kept between min_size and max_size.
+    """
+
+    def __init__(self, initial, target_latency=0.05,
+                 max_batch_bytes=8 * 2**20, min_size=1, max_size=100000):
+        """
+        Args:
+            initial (int): First batch size
+            target_latency (float): Desired seconds per fetch
+            max_batch_bytes (int): Memory budget for one batch
+            min_size (int): Smallest batch size to use
+            max_size (int): Largest batch size to use
+        """
+        self.size = max(min_size, min(initial, max_size))
+        self.target_latency = target_latency
+        self.max_batch_bytes = max_batch_bytes
+        self.min_size = min_size
+        self.max_size = max_size
+
+    def update(self, rows, latency, nbytes):
+        """Records a fetched batch and returns the size for the next one."""
+        if rows:
+            per_row_latency = max(latency / rows, 1e-9)
+            per_row_bytes = max(nbytes / rows, 1)
+            target = min(self.target_latency / per_row_latency,
+                         self.max_batch_bytes / per_row_bytes)
+            target = min(max(target, self.size / 2), self.size * 2)
+            self.size = int(max(self.min_size, min(target, self.max_size)))
+        return self.size
+
+
+def _row_bytes(row):
+    """Estimates the memory held by one row and its values."""
+    values = row.values() if isinstance(row, dict) else row
+    return sys.getsizeof(row) + sum(sys.getsizeof(value) for value in values)
+
+
+def stream_users_in_batches(batch_size, workers=None, ordered=True,
+                            as_columns=False, adaptive=False,
+                            target_latency=0.05, max_batch_bytes=8 * 2**20,
+                            row_format='dict'):
     """
     Generator function that fetches rows in batches from the user_data table.
     
     Args:
         batch_size (int): Number of rows to fetch in each batch
+        workers (int): Split the table into this many user_id ranges and
+            read each on its own connection in a thread pool
+        ordered (bool): With workers, yield batches in user_id order;
+            otherwise yield each batch as soon as any worker has it
+        as_columns (bool): Yield each batch as a dict of NumPy arrays, one
+            per column, built from plain row tuples (requires numpy)
+        adaptive (bool): Start at batch_size, then tune each fetch size
+            from the measured latency and bytes of the previous batch;
+            batches are AdaptiveBatch/AdaptiveColumns carrying the size
+            that was chosen
+        target_latency (float): With adaptive, desired seconds per fetch
+        max_batch_bytes (int): With adaptive, memory budget per batch
+        row_format (str): 'dict', 'tuple' or 'record' rows (see
+            seed.ROW_FORMATS); ignored with as_columns
     
     Yields:
-        list: A batch of user records
-    """
-    connection = seed.connect_to_prodev()
-    if connection:
-        cursor = connection.cursor(dictionary=True)
-        cursor.execute("SELECT * FROM user_data")
-        
-        while True:
-            batch = cursor.fetchmany(batch_size)
-            if not batch:
-                break
-            yield batch
-        
-        cursor.close()
-        connection.close()
+        list: A batch of user records, or a dict of column arrays
+    """
+    if as_columns:
+        columnar.require_numpy()
+    if adaptive:
+        if workers:
+            raise ValueError("adaptive batch sizing needs a single cursor; "
+                             "it cannot be combined with workers")
+        sizer = BatchSizer(batch_size, target_latency, max_batch_bytes)
+        yield from _adaptive_batches(sizer, as_columns, row_format)
+        return
+    if workers:
+        yield from _partitioned_batches(batch_size, workers, ordered,
+                                        as_columns, row_format)
+        return
+
+    with seed.pooled_connection() as connection:
+        if connection:
+            cursor = _batch_cursor(connection, as_columns, row_format)
+            cursor.execute("SELECT * FROM user_data")
+            convert = _batch_converter(cursor, as_columns, row_format)
+            
+            while True:
+                batch = cursor.fetchmany(batch_size)
+                if not batch:
+                    break
+                if convert:
+                    batch = convert(batch)
+                yield batch
+            
+            cursor.close()
+
+
+def _batch_cursor(connection, as_columns, row_format):
+    """Open a cursor returning rows in the shape a batch is built from."""
+    return seed.row_cursor(connection, 'tuple' if as_columns else row_format)
+
+
+def _batch_converter(cursor, as_columns, row_format):
+    """
+    Return a function turning a fetched list of rows into the batch to
+    yield, or None when the rows are yielded as fetched.
+    """
+    if as_columns:
+        return lambda rows: columnar.to_columns(cursor.column_names, rows)
+    make_row = seed.row_maker(cursor, row_format)
+    if make_row:
+        return lambda rows: list(map(make_row, rows))
+    return None
+
+
+def _adaptive_batches(sizer, as_columns, row_format='dict'):
+    """Yield batches whose fetch size is chosen by sizer."""
+    with seed.pooled_connection() as connection:
+        if connection:
+            cursor = _batch_cursor(connection, as_columns, row_format)
+            cursor.execute("SELECT * FROM user_data")
+            convert = _batch_converter(cursor, as_columns, row_format)
+
+            while True:
+                fetch_size = sizer.size
+                started = time.perf_counter()
+                rows = cursor.fetchmany(fetch_size)
+                latency = time.perf_counter() - started
+                if not rows:
+                    break
+                # Rows of one table are similar; size one and extrapolate
+                nbytes = _row_bytes(rows[0]) * len(rows)
+                sizer.update(len(rows), latency, nbytes)
+
+                if convert:
+                    rows = convert(rows)
+                if as_columns:
+                    batch = AdaptiveColumns(rows)
+                else:
+                    batch = AdaptiveBatch(rows)
+                batch.fetch_size = fetch_size
+                batch.latency = latency
+                batch.nbytes = nbytes
+                yield batch
+
+            cursor.close()
+
+
+def key_ranges(partitions):
+    """
+    Split the user_id key space into contiguous ranges.
+
+    user_id values are UUIDs, whose leading hex digits are uniformly
+    distributed, so equal slices of the hex prefix space hold roughly
+    equal numbers of rows.
+
+    Args:
+        partitions (int): Number of ranges
+
+    Returns:
+        list: (lower, upper) bounds, with None for an open end
+    """
+    space = 16 ** PARTITION_KEY_DIGITS
+    bounds = [
+        format(i * space // partitions, f'0{PARTITION_KEY_DIGITS}x')
+        for i in range(1, partitions)
+    ]
+    bounds = [None] + bounds + [None]
+    return list(zip(bounds, bounds[1:]))
+
+
+def _scan_range(lower, upper, batch_size, as_columns, row_format, out, stop):
+    """
+    Read one user_id range in batches and put them on the out queue,
+    followed by _DONE or the exception that ended the scan.
+    """
+    def put(item):
+        while not stop.is_set():
+            try:
+                out.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    conditions = []
+    params = []
+    if lower is not None:
+        conditions.append("user_id >= %s")
+        params.append(lower)
+    if upper is not None:
+        conditions.append("user_id < %s")
+        params.append(upper)
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    try:
+        with seed.pooled_connection() as connection:
+            cursor = _batch_cursor(connection, as_columns, row_format)
+            cursor.execute(
+                f"SELECT * FROM user_data{where} ORDER BY user_id", params)
+            convert = _batch_converter(cursor, as_columns, row_format)
+            while True:
+                batch = cursor.fetchmany(batch_size)
+                if not batch:
+                    break
+                if convert:
+                    batch = convert(batch)
+                if not put(batch):
+                    return
+            cursor.close()
+    except Exception as e:
+        put(e)
+        return
+    put(_DONE)
+
+
+def _partitioned_batches(batch_size, workers, ordered, as_columns,
+                         row_format='dict'):
+    """Yield batches from a parallel range-partitioned scan of user_data."""
+    max_size = seed.get_pool().max_size
+    if workers > max_size:
+        raise ValueError(
+            f"workers={workers} exceeds the connection pool size {max_size}; "
+            "raise it with seed.configure_pool(max_size=...)")
+
+    ranges = key_ranges(workers)
+    stop = threading.Event()
+    if ordered:
+        # One small queue per range, drained in key order
+        queues = [queue.Queue(maxsize=2) for _ in ranges]
+    else:
+        queues = [queue.Queue(maxsize=2 * workers)] * len(ranges)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for (lower, upper), out in zip(ranges, queues):
+            executor.submit(_scan_range, lower, upper, batch_size, as_columns,
+                            row_format, out, stop)
+        try:
+            pending = len(ranges)
+            index = 0
+            while pending:
+                item = queues[index].get()
+                if item is _DONE:
+                    pending -= 1
+                    if ordered:
+                        index += 1
+                elif isinstance(item, Exception):
+                    raise item
+                else:
+                    yield item
+        finally:
+            stop.set()
 
 
 def batch_processing(batch_size):
@@ -38,9 +304,9 @@ def batch_processing(batch_size):
     Args:
         batch_size (int): Number of rows to process in each batch
     """
-    # Process users in batches
-    for batch in stream_users_in_batches(batch_size):
-        # Filter users over age 25 in current batch
+    # The age filter is compiled into the query, so only users over 25
+    # are sent by the database
+    adults = pipeline.users().filter(pipeline.col('age') > 25)
+    for batch in adults.batches(batch_size):
         for user in batch:
-            if user['age'] > 25:
-                print(user)
\ No newline at end of file
+            print(user)
\ No newline at end of file
@@ -3,47 +3,143 @@
 Lazy loading paginated data using generators
 """
 
+from concurrent.futures import ThreadPoolExecutor
+
 import seed
 
 
-def paginate_users(page_size, offset):
+def paginate_users(page_size, offset, row_format='dict'):
     """
     Fetch users with pagination from the database.
     
     Args:
         page_size (int): Number of users per page
         offset (int): Starting position for the page
+        row_format (str): 'dict', 'tuple' or 'record' rows
     
     Returns:
         list: List of user records for the current page
     """
-    connection = seed.connect_to_prodev()
-    cursor = connection.cursor(dictionary=True)
-    cursor.execute(f"SELECT * FROM user_data LIMIT {page_size} OFFSET {offset}")
-    rows = cursor.fetchall()
-    connection.close()
-    return rows
+    with seed.pooled_connection() as connection:
+        cursor = seed.row_cursor(connection, row_format)
+        cursor.execute(f"SELECT * FROM user_data LIMIT {page_size} OFFSET {offset}")
+        rows = cursor.fetchall()
+        make_row = seed.row_maker(cursor, row_format)
+        cursor.close()
+    return list(map(make_row, rows)) if make_row else rows
 
 
-def lazy_paginate(page_size):
+def paginate_users_after(page_size, last_seen=None, row_format='dict'):
+    """
+    Fetch the page of users that follows last_seen in primary key order.
+
+    Seeking on the user_id index costs the same for every page, unlike
+    OFFSET which reads and discards all the preceding rows.
+
+    Args:
+        page_size (int): Number of users per page
+        last_seen (str): user_id of the last row of the previous page,
+            or None for the first page
+        row_format (str): 'dict', 'tuple' or 'record' rows
+
+    Returns:
+        list: List of user records for the current page
+    """
+    return _page_after(page_size, last_seen, row_format)[0]
+
+
+def _page_after(page_size, last_seen, row_format):
+    """Return the page after last_seen and a getter for its user_id."""
+    with seed.pooled_connection() as connection:
+        cursor = seed.row_cursor(connection, row_format)
+        if last_seen is None:
+            cursor.execute(
+                "SELECT * FROM user_data ORDER BY user_id LIMIT %s",
+                (page_size,)
+            )
+        else:
+            cursor.execute(
+                "SELECT * FROM user_data WHERE user_id > %s "
+                "ORDER BY user_id LIMIT %s",
+                (last_seen, page_size)
+            )
+        rows = cursor.fetchall()
+        make_row = seed.row_maker(cursor, row_format)
+        user_id = seed.column_getter(cursor, row_format, 'user_id')
+        cursor.close()
+    if make_row:
+        rows = list(map(make_row, rows))
+    return rows, user_id
+
+
+def lazy_paginate(page_size, keyset=False, prefetch=False, row_format='dict'):
     """
     Generator that lazily loads pages of users.
     Only fetches the next page when needed.
     
     Args:
         page_size (int): Number of users per page
+        keyset (bool): Seek on user_id instead of using OFFSET, so pages
+            come back in primary key order at a constant cost per page
+        prefetch (bool): Fetch the next page on a background thread
+            while the caller consumes the current one
+        row_format (str): 'dict', 'tuple' or 'record' rows
     
     Yields:
         list: A page of user records
     """
+    if keyset:
+        fetch_next = _keyset_pages(page_size, row_format)
+    else:
+        fetch_next = _offset_pages(page_size, row_format)
+
+    if not prefetch:
+        while True:
+            page = fetch_next()
+            if not page:
+                break
+            yield page
+        return
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        pending = executor.submit(fetch_next)
+        try:
+            while True:
+                page = pending.result()
+                if not page:
+                    break
+                # Start on the next page before handing this one out
+                pending = executor.submit(fetch_next)
+                yield page
+        finally:
+            pending.cancel()
+
+
+def _offset_pages(page_size, row_format='dict'):
+    """Return a callable fetching successive pages with LIMIT/OFFSET."""
     offset = 0
-    
-    while True:
-        page = paginate_users(page_size, offset)
-        if not page:
-            break
-        yield page
+
+    def fetch_next():
+        nonlocal offset
+        page = paginate_users(page_size, offset, row_format)
         offset += page_size
+        return page
+
+    return fetch_next
+
+
+def _keyset_pages(page_size, row_format='dict'):
+    """Return a callable fetching successive pages by seeking on user_id."""
+    last_seen = None
+
+    def fetch_next():
+        nonlocal last_seen
+        page, user_id = _page_after(page_size, last_seen, row_format)
+        if page:
+            last_seen = user_id(page[-1])
+        return page
+
+    return fetch_next
 
 
 # Alias for the main function to match the test requirements
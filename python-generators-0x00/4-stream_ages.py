@@ -3,7 +3,10 @@
 Memory-efficient aggregation using generators to compute average age
 """
 
+import aggregates
+import columnar
 import seed
+import stats
 
 
 def stream_user_ages():
@@ -13,27 +16,74 @@ def stream_user_ages():
     Yields:
         int: User age
     """
-    connection = seed.connect_to_prodev()
-    if connection:
-        cursor = connection.cursor()
-        cursor.execute("SELECT age FROM user_data")
-        
-        # Yield each age one by one
-        for row in cursor:
-            yield row[0]
-        
-        cursor.close()
-        connection.close()
+    with seed.pooled_connection() as connection:
+        if connection:
+            cursor = connection.cursor()
+            cursor.execute("SELECT age FROM user_data")
+            
+            # Yield each age one by one
+            for row in cursor:
+                yield row[0]
+            
+            cursor.close()
 
 
-def calculate_average_age():
+def stream_age_arrays(batch_size=10000):
+    """
+    Generator that yields user ages as NumPy int64 arrays of batch_size.
+
+    Yields:
+        numpy.ndarray: A batch of ages
+    """
+    columnar.require_numpy()
+    with seed.pooled_connection() as connection:
+        if connection:
+            cursor = connection.cursor()
+            cursor.execute("SELECT age FROM user_data")
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield columnar.to_columns(cursor.column_names, rows)['age']
+            cursor.close()
+
+
+def calculate_average_age(materialized=True, pushdown=True,
+                          vectorized=False):
     """
     Calculate the average age of all users using the generator.
     This method is memory-efficient as it doesn't load all data at once.
+
+    Args:
+        materialized (bool): Read the average from the aggregates kept by
+            seed.insert_data in constant time, when they exist
+        pushdown (bool): Let the database compute AVG(age) instead of
+            streaming every age to the client
+        vectorized (bool): When streaming, sum NumPy batches of ages
+            instead of adding them one by one (requires numpy)
     
     Returns:
         float: Average age of users
     """
+    if materialized:
+        with seed.pooled_connection() as connection:
+            summary = aggregates.summary(connection) if connection else None
+        if summary is not None:
+            return summary['mean']
+
+    if pushdown:
+        with seed.pooled_connection() as connection:
+            if connection:
+                return stats.sql_summary(connection)['mean']
+
+    if vectorized:
+        total_age = 0
+        count = 0
+        for ages in stream_age_arrays():
+            total_age += int(ages.sum())
+            count += len(ages)
+        return total_age / count if count else 0
+
     total_age = 0
     count = 0
     
@@ -47,6 +97,35 @@ def calculate_average_age():
     return 0
 
 
+def age_statistics(quantiles=(0.5, 0.95, 0.99), pushdown=True):
+    """
+    Compute count, mean, standard deviation, min, max and quantiles of age.
+
+    With pushdown the database returns a per-age histogram (a few hundred
+    rows at most) plus the summary, and the quantiles are read exactly off
+    the histogram. Otherwise every age is streamed once through one-pass
+    accumulators and the quantiles are estimated by a bounded sketch.
+
+    Args:
+        quantiles (tuple): Quantiles to report, e.g. 0.95 for p95
+        pushdown (bool): Aggregate in SQL instead of on the client
+
+    Returns:
+        dict: Statistics keyed by name, with quantiles as p50, p95, ...
+    """
+    if pushdown:
+        with seed.pooled_connection() as connection:
+            if connection:
+                summary = stats.sql_summary(connection)
+                histogram = stats.sql_histogram(connection)
+                for q in quantiles:
+                    summary[stats.quantile_label(q)] = \
+                        stats.histogram_quantile(histogram, q)
+                return summary
+
+    return stats.summarize(stream_user_ages(), quantiles)
+
+
 if __name__ == "__main__":
     average_age = calculate_average_age()
     print(f"Average age of users: {average_age}")
\ No newline at end of file
@@ -0,0 +1,223 @@
+#!/usr/bin/python3
+"""
+Materialized age aggregates for user_data
+
+user_age_totals holds the row count, sum and sum of squares of age, and
+user_age_histogram the number of users per age. Writers update both in the
+same transaction as the rows they insert (see seed.bulk_insert), so the
+mean, standard deviation and age distribution can be read in constant time
+instead of scanning user_data.
+
+Usage:
+    python3 aggregates.py verify    # compare with a full scan of user_data
+    python3 aggregates.py rebuild   # recompute from user_data
+"""
+
+import collections
+import math
+import sqlite3
+import sys
+
+from mysql.connector import Error
+
+import stats
+
+# Single row id of user_age_totals
+TOTALS_ID = 1
+
+
+def create_aggregate_tables(connection):
+    """
+    Creates the aggregate tables, filling them from user_data the first
+    time so that they agree with the rows loaded before they existed.
+    """
+    cursor = connection.cursor()
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS user_age_totals (
+        id TINYINT PRIMARY KEY,
+        row_count BIGINT NOT NULL,
+        age_sum DECIMAL(38,0) NOT NULL,
+        age_sumsq DECIMAL(38,0) NOT NULL
+    )
+    """)
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS user_age_histogram (
+        age INT PRIMARY KEY,
+        row_count BIGINT NOT NULL
+    )
+    """)
+    cursor.execute("SELECT 1 FROM user_age_totals WHERE id = %s",
+                   (TOTALS_ID,))
+    initialized = cursor.fetchone() is not None
+    cursor.close()
+    connection.commit()
+    if not initialized:
+        rebuild(connection)
+
+
+def record_inserts(cursor, ages):
+    """
+    Adds newly inserted users to the aggregates.
+
+    Runs on the writer's cursor and does not commit: the caller commits it
+    together with the inserted rows, so the aggregates never count rows
+    that were rolled back.
+
+    Args:
+        cursor: Cursor inside the inserting transaction
+        ages (iterable): Age of each inserted user
+    """
+    per_age = collections.Counter(int(age) for age in ages)
+    if not per_age:
+        return
+    count = sum(per_age.values())
+    total = sum(age * n for age, n in per_age.items())
+    squares = sum(age * age * n for age, n in per_age.items())
+    cursor.execute("""
+    INSERT INTO user_age_totals (id, row_count, age_sum, age_sumsq)
+    VALUES (%s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE row_count = row_count + VALUES(row_count),
+        age_sum = age_sum + VALUES(age_sum),
+        age_sumsq = age_sumsq + VALUES(age_sumsq)
+    """, (TOTALS_ID, count, total, squares))
+    cursor.executemany("""
+    INSERT INTO user_age_histogram (age, row_count) VALUES (%s, %s)
+    ON DUPLICATE KEY UPDATE row_count = row_count + VALUES(row_count)
+    """, sorted(per_age.items()))
+
+
+def summary(connection):
+    """
+    Reads count, mean and standard deviation of age from the aggregates.
+
+    Returns:
+        dict: count, mean and stddev, or None if the aggregates have not
+        been created
+    """
+    cursor = connection.cursor()
+    try:
+        cursor.execute(
+            "SELECT row_count, age_sum, age_sumsq FROM user_age_totals "
+            "WHERE id = %s", (TOTALS_ID,))
+        row = cursor.fetchone()
+    except (Error, sqlite3.Error):
+        # Table missing: the caller falls back to scanning user_data
+        return None
+    finally:
+        cursor.close()
+    if row is None:
+        return None
+    count, total, squares = (int(value) for value in row)
+    if not count:
+        return {'count': 0, 'mean': 0.0, 'stddev': 0.0}
+    mean = total / count
+    # Exact integer arithmetic avoids cancellation in sumsq/n - mean^2
+    variance = (squares * count - total * total) / (count * count)
+    return {'count': count, 'mean': mean, 'stddev': math.sqrt(variance)}
+
+
+def histogram(connection):
+    """
+    Returns:
+        list: (age, row count) pairs in ascending order, as from
+        stats.sql_histogram
+    """
+    cursor = connection.cursor()
+    cursor.execute("SELECT age, row_count FROM user_age_histogram "
+                   "WHERE row_count > 0 ORDER BY age")
+    pairs = [(float(age), int(count)) for age, count in cursor.fetchall()]
+    cursor.close()
+    return pairs
+
+
+def rebuild(connection):
+    """
+    Recomputes the aggregates from user_data in one transaction.
+
+    Returns:
+        dict: The rebuilt summary
+    """
+    cursor = connection.cursor()
+    try:
+        cursor.execute("DELETE FROM user_age_histogram")
+        cursor.execute("""
+        INSERT INTO user_age_histogram (age, row_count)
+        SELECT age, COUNT(*) FROM user_data GROUP BY age
+        """)
+        cursor.execute("DELETE FROM user_age_totals")
+        cursor.execute("""
+        INSERT INTO user_age_totals (id, row_count, age_sum, age_sumsq)
+        SELECT %s, COUNT(*), COALESCE(SUM(age), 0),
+            COALESCE(SUM(age * age), 0)
+        FROM user_data
+        """, (TOTALS_ID,))
+        connection.commit()
+    except Error:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+    return summary(connection)
+
+
+def verify(connection):
+    """
+    Compares the aggregates with a full scan of user_data.
+
+    Returns:
+        list: Descriptions of each mismatch; empty when they agree
+    """
+    problems = []
+    materialized = summary(connection)
+    if materialized is None:
+        return ["aggregate tables are missing or empty"]
+    scanned = stats.sql_summary(connection)
+    if materialized['count'] != scanned['count']:
+        problems.append(f"count: {materialized['count']} materialized, "
+                        f"{scanned['count']} in user_data")
+    elif not math.isclose(materialized['mean'], scanned['mean'],
+                          abs_tol=1e-9):
+        problems.append(f"mean: {materialized['mean']} materialized, "
+                        f"{scanned['mean']} in user_data")
+
+    expected = dict(stats.sql_histogram(connection))
+    actual = dict(histogram(connection))
+    for age in sorted(expected.keys() | actual.keys()):
+        if expected.get(age, 0) != actual.get(age, 0):
+            problems.append(f"age {age:g}: {actual.get(age, 0)} "
+                            f"materialized, {expected.get(age, 0)} "
+                            f"in user_data")
+    return problems
+
+
+def main():
+    """Runs the verify or rebuild command against ALX_prodev."""
+    # Imported here because seed imports this module
+    import seed
+
+    if len(sys.argv) != 2 or sys.argv[1] not in ('verify', 'rebuild'):
+        print(f"Usage: {sys.argv[0]} verify|rebuild")
+        sys.exit(2)
+
+    connection = seed.connect_to_prodev()
+    if not connection:
+        sys.exit(1)
+    try:
+        create_aggregate_tables(connection)
+        if sys.argv[1] == 'rebuild':
+            print(f"Rebuilt age aggregates: {rebuild(connection)}")
+            return
+        problems = verify(connection)
+        for problem in problems:
+            print(problem)
+        if problems:
+            print("Age aggregates do not match user_data; "
+                  "run 'python3 aggregates.py rebuild'")
+            sys.exit(1)
+        print("Age aggregates match user_data")
+    finally:
+        connection.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+#!/usr/bin/python3
+"""
+Async generator counterparts of the user_data streaming functions
+
+Each generator reads on a background task into a bounded asyncio.Queue,
+so at most read_ahead batches are buffered ahead of the consumer and a
+slow consumer pauses the reads. They run on aiomysql against ALX_prodev by
+default, or on any aiosqlite connection holding a user_data table, which
+makes them usable offline.
+
+Example:
+    async for user in async_stream_users():
+        print(user)
+"""
+
+import asyncio
+import contextlib
+
+try:
+    import aiomysql
+except ImportError:
+    aiomysql = None
+
+try:
+    import aiosqlite
+except ImportError:
+    aiosqlite = None
+
+_DONE = object()
+
+
+async def connect_mysql():
+    """Opens an aiomysql connection to ALX_prodev using seed's settings."""
+    if aiomysql is None:
+        raise ImportError("Async MySQL access requires aiomysql: "
+                          "pip install aiomysql")
+    # Imported here because seed needs mysql-connector, which the
+    # aiosqlite streams do not
+    import seed
+
+    config = dict(seed.PRODEV_CONFIG)
+    config['db'] = config.pop('database')
+    return await aiomysql.connect(**config)
+
+
+async def connect_sqlite(path):
+    """Opens an aiosqlite connection, e.g. to a local copy of user_data."""
+    if aiosqlite is None:
+        raise ImportError("Async SQLite access requires aiosqlite: "
+                          "pip install aiosqlite")
+    return await aiosqlite.connect(path)
+
+
+def _is_sqlite(connection):
+    return aiosqlite is not None and isinstance(connection, aiosqlite.Connection)
+
+
+def _prepare(connection, query):
+    """Adapts %s placeholders to the connection's parameter style."""
+    return query.replace('%s', '?') if _is_sqlite(connection) else query
+
+
+async def _cursor(connection, streaming):
+    """Opens a cursor; on MySQL a streaming one reads rows unbuffered."""
+    if streaming and not _is_sqlite(connection):
+        return await connection.cursor(aiomysql.SSCursor)
+    return await connection.cursor()
+
+
+@contextlib.asynccontextmanager
+async def _connection(connection):
+    """
+    Yields (connection, owned): connection itself, or a new ALX_prodev
+    connection that is owned by the caller and closed on exit.
+    """
+    if connection is not None:
+        yield connection, False
+        return
+    connection = await connect_mysql()
+    try:
+        yield connection, True
+    finally:
+        result = connection.close()
+        if asyncio.iscoroutine(result):
+            await result
+
+
+async def _drain(queue, producer):
+    """
+    Yields items from queue until the producer is done, re-raising its
+    errors and cancelling it if the consumer stops early.
+    """
+    task = asyncio.create_task(producer)
+    try:
+        while True:
+            item = await queue.get()
+            if item is _DONE:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await task
+
+
+async def _read_batches(connection, query, params, batch_size, queue,
+                        owned=False):
+    """
+    Puts batches of row dicts from query on queue, then _DONE.
+
+    Closing an unbuffered MySQL cursor reads the rest of its result, so
+    when the consumer stops early an owned connection is closed instead,
+    dropping the unread rows with it.
+    """
+    try:
+        cursor = await _cursor(connection, streaming=True)
+        dropped = False
+        try:
+            await cursor.execute(_prepare(connection, query), params)
+            names = [column[0] for column in cursor.description]
+            while True:
+                rows = await cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                await queue.put([dict(zip(names, row)) for row in rows])
+        except asyncio.CancelledError:
+            if owned and not _is_sqlite(connection):
+                connection.close()
+                dropped = True
+            raise
+        finally:
+            if not dropped:
+                await cursor.close()
+    except Exception as e:
+        await queue.put(e)
+        return
+    await queue.put(_DONE)
+
+
+async def async_stream_users_in_batches(batch_size, connection=None,
+                                        read_ahead=4):
+    """
+    Async generator that fetches rows in batches from the user_data table.
+
+    Args:
+        batch_size (int): Number of rows to fetch in each batch
+        connection: aiomysql or aiosqlite connection; a new ALX_prodev
+            connection is opened and closed when omitted. Stopping early
+            on a MySQL connection passed in still reads the rest of the
+            result, to leave the connection usable
+        read_ahead (int): Batches fetched ahead of the consumer
+
+    Yields:
+        list: A batch of user records
+    """
+    async with _connection(connection) as (connection, owned):
+        queue = asyncio.Queue(maxsize=read_ahead)
+        producer = _read_batches(connection, "SELECT * FROM user_data", (),
+                                 batch_size, queue, owned)
+        async with contextlib.aclosing(_drain(queue, producer)) as batches:
+            async for batch in batches:
+                yield batch
+
+
+async def async_stream_users(connection=None, fetch_size=100, read_ahead=4):
+    """
+    Async generator that yields rows one by one from the user_data table.
+
+    Args:
+        connection: aiomysql or aiosqlite connection; a new ALX_prodev
+            connection is opened and closed when omitted. Stopping early
+            on a MySQL connection passed in still reads the rest of the
+            result, to leave the connection usable
+        fetch_size (int): Rows read per round trip
+        read_ahead (int): Blocks of fetch_size rows read ahead
+
+    Yields:
+        dict: A user record
+    """
+    batches = async_stream_users_in_batches(fetch_size, connection,
+                                            read_ahead)
+    async with contextlib.aclosing(batches):
+        async for batch in batches:
+            for row in batch:
+                yield row
+
+
+async def _read_pages(connection, page_size, queue):
+    """Puts keyset-paginated pages of user_data on queue, then _DONE."""
+    last_seen = None
+    try:
+        while True:
+            cursor = await _cursor(connection, streaming=False)
+            try:
+                if last_seen is None:
+                    await cursor.execute(
+                        _prepare(connection, "SELECT * FROM user_data "
+                                 "ORDER BY user_id LIMIT %s"),
+                        (page_size,))
+                else:
+                    await cursor.execute(
+                        _prepare(connection, "SELECT * FROM user_data "
+                                 "WHERE user_id > %s "
+                                 "ORDER BY user_id LIMIT %s"),
+                        (last_seen, page_size))
+                names = [column[0] for column in cursor.description]
+                page = [dict(zip(names, row))
+                        for row in await cursor.fetchall()]
+            finally:
+                await cursor.close()
+            if not page:
+                break
+            await queue.put(page)
+            last_seen = page[-1]['user_id']
+    except Exception as e:
+        await queue.put(e)
+        return
+    await queue.put(_DONE)
+
+
+async def async_lazy_paginate(page_size, connection=None, read_ahead=1):
+    """
+    Async generator that lazily loads pages of users in user_id order.
+
+    Pages are fetched with a keyset seek, so every page costs the same.
+
+    Args:
+        page_size (int): Number of users per page
+        connection: aiomysql or aiosqlite connection; a new ALX_prodev
+            connection is opened and closed when omitted
+        read_ahead (int): Pages fetched ahead of the consumer
+
+    Yields:
+        list: A page of user records
+    """
+    async with _connection(connection) as (connection, _):
+        queue = asyncio.Queue(maxsize=read_ahead)
+        producer = _read_pages(connection, page_size, queue)
+        async with contextlib.aclosing(_drain(queue, producer)) as pages:
+            async for page in pages:
+                yield page
@@ -0,0 +1,396 @@
+#!/usr/bin/python3
+"""
+Benchmark harness for the user_data streaming generators
+
+Seeds a synthetic user_data table in a separate local database
+(ALX_prodev_bench by default) at each requested size, then runs every access
+path over the whole table in a fresh process and reports rows/s,
+time-to-first-row and peak RSS as one JSON object per line. RSS is also
+sampled while rows go by: a generator that really streams keeps it flat.
+stream_users and stream_users(fetch_size=1000) both read an unbuffered
+cursor, so both should stay flat; they differ only in fetching one row
+versus a block of rows per call.
+
+Usage:
+    python3 benchmark.py run [--sizes 100000,1000000] [--paths ...]
+                             [--batch-sizes 100,1000,10000] [--workers 2,4]
+                             [--output results.jsonl]
+    python3 benchmark.py rows [--rows 1000000]
+    python3 benchmark.py compare old.jsonl new.jsonl
+
+Besides the plain scans, the paths include unordered partitioned scans
+(workers=N, ordered=False) and an age > 25 filter over dict batches and
+over columnar batches, so both can be compared at each batch size.
+
+The rows command loads the first rows of user_data into a list once per
+row format (dict, tuple, record) and reports bytes held per row and
+load time, to compare the formats' allocation cost.
+"""
+
+import argparse
+import contextlib
+import json
+import multiprocessing
+import operator
+import os
+import random
+import resource
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import aggregates
+import columnar
+import seed
+
+stream_users = __import__('0-stream_users').stream_users
+stream_users_in_batches = \
+    __import__('1-batch_processing').stream_users_in_batches
+lazy_paginate = __import__('2-lazy_paginate').lazy_paginate
+stream_user_ages = __import__('4-stream_ages').stream_user_ages
+
+SYNTHETIC_SOURCE = 'synthetic'
+BENCH_DATABASE = 'ALX_prodev_bench'
+RSS_SAMPLES = 20
+
+
+def current_rss():
+    """
+    Returns:
+        int: Resident set size of this process in bytes
+    """
+    try:
+        with open('/proc/self/statm') as statm:
+            pages = int(statm.read().split()[1])
+        return pages * resource.getpagesize()
+    except OSError:
+        return peak_rss()
+
+
+def peak_rss():
+    """
+    Returns:
+        int: Peak resident set size of this process in bytes
+    """
+    # ru_maxrss is reported in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def synthetic_users(start, stop):
+    """
+    Yields deterministic (name, email, age) tuples for positions start..stop.
+    """
+    for position in range(start, stop):
+        rng = random.Random(position)
+        yield (
+            f"User {position}",
+            f"user{position}@example.com",
+            rng.randint(18, 100),
+        )
+
+
+def use_database(database):
+    """Points seed and its connection pool at database, creating it."""
+    connection = seed.connect_db()
+    cursor = connection.cursor()
+    cursor.execute(f"CREATE DATABASE IF NOT EXISTS {database}")
+    cursor.close()
+    connection.close()
+    seed.PRODEV_CONFIG['database'] = database
+    seed.configure_pool()
+
+
+def seed_synthetic(rows, chunk_size=10000):
+    """
+    Grows user_data with synthetic users until it holds the first rows of
+    the synthetic data set, resuming from the load checkpoint.
+    """
+    connection = seed.connect_to_prodev()
+    seed.create_table(connection)
+    seed.create_checkpoint_table(connection)
+    aggregates.create_aggregate_tables(connection)
+    cursor = connection.cursor()
+    cursor.execute(
+        "SELECT rows_done FROM load_checkpoint WHERE source = %s",
+        (SYNTHETIC_SOURCE,)
+    )
+    checkpoint = cursor.fetchone()
+    cursor.close()
+    start = checkpoint[0] if checkpoint else 0
+    if start < rows:
+        seed.bulk_insert(connection, synthetic_users(start, rows),
+                         SYNTHETIC_SOURCE, start, chunk_size)
+    elif start > rows:
+        print(f"user_data already holds {start} synthetic rows; "
+              f"sizes must be given in ascending order", file=sys.stderr)
+    connection.close()
+
+
+def age_filter(batches, columns):
+    """
+    Counts users over 25 in each batch, the filter user-facing code runs
+    on dict batches and columnar batches alike.
+
+    Yields:
+        tuple: (rows in the batch, rows matching the filter)
+    """
+    for batch in batches:
+        if columns:
+            yield columnar.batch_length(batch), int((batch['age'] > 25).sum())
+        else:
+            yield len(batch), sum(1 for user in batch if user['age'] > 25)
+
+
+def access_paths(batch_sizes, workers):
+    """
+    Builds the access paths to measure.
+
+    Returns:
+        dict: Path name to (generator factory, rows per yielded item)
+    """
+    one = (lambda item: 1)
+    first = operator.itemgetter(0)
+    paths = {
+        'stream_users': (lambda: stream_users(), one),
+        'stream_users(fetch_size=1000)':
+            (lambda: stream_users(fetch_size=1000), one),
+        'lazy_paginate(1000)': (lambda: lazy_paginate(1000), len),
+        'lazy_paginate(1000, keyset=True)':
+            (lambda: lazy_paginate(1000, keyset=True), len),
+        'stream_user_ages': (lambda: stream_user_ages(), one),
+    }
+    for size in batch_sizes:
+        paths[f'stream_users_in_batches({size})'] = (
+            lambda size=size: stream_users_in_batches(size), len)
+        paths[f'age > 25 filter, dict batches({size})'] = (
+            lambda size=size: age_filter(
+                stream_users_in_batches(size), columns=False),
+            first)
+        if columnar.np is not None:
+            paths[f'stream_users_in_batches({size}, as_columns=True)'] = (
+                lambda size=size: stream_users_in_batches(
+                    size, as_columns=True),
+                columnar.batch_length)
+            paths[f'age > 25 filter, columnar batches({size})'] = (
+                lambda size=size: age_filter(
+                    stream_users_in_batches(size, as_columns=True),
+                    columns=True),
+                first)
+    for row_format in ('tuple', 'record'):
+        paths[f'stream_users(fetch_size=1000, row_format={row_format!r})'] = (
+            lambda row_format=row_format: stream_users(
+                fetch_size=1000, row_format=row_format),
+            one)
+        paths[f'stream_users_in_batches(1000, row_format={row_format!r})'] = (
+            lambda row_format=row_format: stream_users_in_batches(
+                1000, row_format=row_format),
+            len)
+    for count in workers:
+        paths[f'stream_users_in_batches(1000, workers={count})'] = (
+            lambda count=count: stream_users_in_batches(1000, workers=count),
+            len)
+        paths[f'stream_users_in_batches(1000, workers={count}, '
+              f'ordered=False)'] = (
+            lambda count=count: stream_users_in_batches(
+                1000, workers=count, ordered=False),
+            len)
+    return paths
+
+
+def measure(path, size, database, batch_sizes, workers):
+    """
+    Runs one access path over the whole table; meant for a fresh process.
+
+    Returns:
+        dict: Rows read, seconds, rows/s, time to first row, peak RSS and
+        (rows read, RSS) samples
+    """
+    # Keep connection messages out of the JSON written to stdout
+    with contextlib.redirect_stdout(sys.stderr):
+        seed.PRODEV_CONFIG['database'] = database
+        seed.configure_pool(max_size=max(workers + [5]))
+        factory, rows_of = access_paths(batch_sizes, workers)[path]
+        return _timed_scan(factory, rows_of, size)
+
+
+def _timed_scan(factory, rows_of, size):
+    """Times one full pass over factory(), sampling RSS along the way."""
+    every = max(size // RSS_SAMPLES, 1)
+    next_sample = every
+    baseline = current_rss()
+    samples = [(0, baseline)]
+    first_row = None
+    count = 0
+    started = time.monotonic()
+    for item in factory():
+        if first_row is None:
+            first_row = time.monotonic() - started
+        count += rows_of(item)
+        if count >= next_sample:
+            samples.append((count, current_rss()))
+            next_sample += every
+    elapsed = time.monotonic() - started
+    samples.append((count, current_rss()))
+
+    return {
+        'rows': count,
+        'seconds': elapsed,
+        'rows_per_second': count / elapsed if elapsed else 0.0,
+        'time_to_first_row': first_row,
+        'peak_rss': peak_rss(),
+        'rss_growth': max(rss for _, rss in samples) - baseline,
+        'rss_samples': samples,
+    }
+
+
+def retained_rows(rows, row_format, database):
+    """
+    Holds the first rows of user_data in a list; meant for a fresh process.
+
+    Returns:
+        dict: Rows loaded, seconds, and RSS growth in total and per row
+    """
+    with contextlib.redirect_stdout(sys.stderr):
+        seed.PRODEV_CONFIG['database'] = database
+        baseline = current_rss()
+        started = time.monotonic()
+        held = []
+        for row in stream_users(fetch_size=1000, row_format=row_format):
+            held.append(row)
+            if len(held) >= rows:
+                break
+        elapsed = time.monotonic() - started
+        growth = current_rss() - baseline
+    return {
+        'rows': len(held),
+        'seconds': elapsed,
+        'rss_growth': growth,
+        'bytes_per_row': growth / len(held) if held else 0.0,
+    }
+
+
+def git_commit():
+    """Returns the current git commit hash, or None outside a checkout."""
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+            check=True, cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    """Seeds each size and writes one JSON result per access path."""
+    sizes = sorted(int(float(size)) for size in args.sizes.split(','))
+    batch_sizes = [int(size) for size in args.batch_sizes.split(',')]
+    workers = [int(count) for count in args.workers.split(',') if count]
+    paths = list(access_paths(batch_sizes, workers))
+    if args.paths:
+        paths = [path for path in paths
+                 if any(name in path for name in args.paths.split(','))]
+
+    commit = git_commit()
+    output = open(args.output, 'a') if args.output else sys.stdout
+    context = multiprocessing.get_context('spawn')
+    try:
+        with contextlib.redirect_stdout(sys.stderr):
+            use_database(args.database)
+        for size in sizes:
+            with contextlib.redirect_stdout(sys.stderr):
+                seed_synthetic(size)
+            for path in paths:
+                # A fresh process per path keeps peak RSS attributable
+                with ProcessPoolExecutor(1, mp_context=context) as executor:
+                    result = executor.submit(
+                        measure, path, size, args.database, batch_sizes,
+                        workers).result()
+                record = {'commit': commit, 'size': size, 'path': path}
+                record.update(result)
+                output.write(json.dumps(record) + '\n')
+                output.flush()
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+
+def rows_command(args):
+    """Writes one JSON result per row format for a list of held rows."""
+    commit = git_commit()
+    context = multiprocessing.get_context('spawn')
+    with contextlib.redirect_stdout(sys.stderr):
+        use_database(args.database)
+        seed_synthetic(args.rows)
+    for row_format in seed.ROW_FORMATS:
+        with ProcessPoolExecutor(1, mp_context=context) as executor:
+            result = executor.submit(
+                retained_rows, args.rows, row_format, args.database).result()
+        record = {'commit': commit, 'size': args.rows,
+                  'path': f'retained rows ({row_format})'}
+        record.update(result)
+        print(json.dumps(record), flush=True)
+
+
+def load_results(filename):
+    """
+    Returns:
+        dict: (size, path) to the last result recorded for it in filename
+    """
+    results = {}
+    with open(filename) as results_file:
+        for line in results_file:
+            if line.strip():
+                record = json.loads(line)
+                results[(record['size'], record['path'])] = record
+    return results
+
+
+def compare(args):
+    """Prints rows/s and peak RSS changes between two result files."""
+    old = load_results(args.old)
+    new = load_results(args.new)
+    for key in sorted(old.keys() & new.keys()):
+        before, after = old[key], new[key]
+        speed = after['rows_per_second'] / (before['rows_per_second'] or 1)
+        memory = after['peak_rss'] / (before['peak_rss'] or 1)
+        print(f"{key[0]:>10} {key[1]:<50} rows/s x{speed:5.2f}  "
+              f"peak rss x{memory:5.2f}")
+
+
+def main():
+    """Parses the command line and runs or compares benchmarks."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help="run the benchmarks")
+    run_parser.add_argument('--sizes', default='100000,1000000',
+                            help="comma-separated table sizes, e.g. 1e5,1e7")
+    run_parser.add_argument('--paths', default='',
+                            help="comma-separated substrings of path names")
+    run_parser.add_argument('--batch-sizes', default='100,1000,10000')
+    run_parser.add_argument('--workers', default='2,4',
+                            help="worker counts for partitioned scans")
+    run_parser.add_argument('--database', default=BENCH_DATABASE)
+    run_parser.add_argument('--output', help="append JSON lines to this file")
+    run_parser.set_defaults(handler=run)
+
+    rows_parser = commands.add_parser(
+        'rows', help="compare memory held per row for each row format")
+    rows_parser.add_argument('--rows', type=int, default=1_000_000)
+    rows_parser.add_argument('--database', default=BENCH_DATABASE)
+    rows_parser.set_defaults(handler=rows_command)
+
+    compare_parser = commands.add_parser(
+        'compare', help="compare two result files")
+    compare_parser.add_argument('old')
+    compare_parser.add_argument('new')
+    compare_parser.set_defaults(handler=compare)
+
+    args = parser.parse_args()
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/python3
+"""
+Checkpoint tokens and stores for resumable scans of user_data
+
+A checkpoint token is an opaque string recording the last user_id a
+consumer finished with. Scans that restart from a token seek past it on
+the primary key, so a rerun only reads the rows that are left.
+"""
+
+import base64
+import json
+import os
+import sqlite3
+import tempfile
+
+TOKEN_VERSION = 1
+
+
+def encode_token(last_user_id):
+    """
+    Returns:
+        str: Opaque checkpoint token for a scan that got past last_user_id
+    """
+    payload = json.dumps({'v': TOKEN_VERSION, 'after': last_user_id})
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_token(token):
+    """
+    Returns:
+        str: The last user_id recorded in token
+
+    Raises:
+        ValueError: If token was not produced by encode_token
+    """
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token.encode()))
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid checkpoint token: {token!r}") from e
+    if not isinstance(payload, dict) or payload.get('v') != TOKEN_VERSION:
+        raise ValueError(f"Unsupported checkpoint token: {token!r}")
+    return payload['after']
+
+
+class FileCheckpoint:
+    """Keeps the latest token in a local file, replaced atomically."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def load(self):
+        """Returns the saved token, or None if nothing was saved yet."""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as file:
+                return file.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def save(self, token):
+        """Saves token so that a crash never leaves a partial file."""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, temporary = tempfile.mkstemp(dir=directory, prefix='.checkpoint')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as file:
+                file.write(token)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(temporary, self.path)
+        except BaseException:
+            os.unlink(temporary)
+            raise
+
+    def clear(self):
+        """Forgets the saved token so the next scan starts from the top."""
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class SQLiteCheckpoint:
+    """Keeps one token per job name in a local SQLite database."""
+
+    def __init__(self, path, job='stream_users'):
+        self.path = path
+        self.job = job
+        with sqlite3.connect(self.path) as connection:
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS checkpoints (
+                    job TEXT PRIMARY KEY,
+                    token TEXT NOT NULL,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+
+    def load(self):
+        """Returns the saved token for this job, or None."""
+        with sqlite3.connect(self.path) as connection:
+            row = connection.execute(
+                "SELECT token FROM checkpoints WHERE job = ?", (self.job,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def save(self, token):
+        """Saves token for this job."""
+        with sqlite3.connect(self.path) as connection:
+            connection.execute(
+                "INSERT INTO checkpoints (job, token) VALUES (?, ?) "
+                "ON CONFLICT(job) DO UPDATE SET token = excluded.token, "
+                "updated_at = CURRENT_TIMESTAMP",
+                (self.job, token)
+            )
+
+    def clear(self):
+        """Forgets the saved token for this job."""
+        with sqlite3.connect(self.path) as connection:
+            connection.execute(
+                "DELETE FROM checkpoints WHERE job = ?", (self.job,))
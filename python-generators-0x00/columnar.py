@@ -0,0 +1,64 @@
+#!/usr/bin/python3
+"""
+Columnar NumPy batches for the user_data generators
+
+A columnar batch is a dict mapping each column name to a NumPy array, so
+filters and aggregates can run vectorized instead of row by row.
+"""
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# NumPy dtype per user_data column; anything else is stored as objects
+COLUMN_DTYPES = {
+    'age': 'int64',
+}
+
+
+def require_numpy():
+    """Raises ImportError when NumPy is not installed."""
+    if np is None:
+        raise ImportError("Columnar batches require numpy: pip install numpy")
+
+
+def to_columns(column_names, rows):
+    """
+    Converts row tuples into one NumPy array per column.
+
+    Args:
+        column_names (tuple): Column names, in row order
+        rows (list): Row tuples as returned by a non-dictionary cursor
+
+    Returns:
+        dict: Column name to NumPy array
+    """
+    require_numpy()
+    values = list(zip(*rows)) if rows else [()] * len(column_names)
+    columns = {}
+    for name, column in zip(column_names, values):
+        dtype = COLUMN_DTYPES.get(name)
+        if dtype is None:
+            array = np.empty(len(column), dtype=object)
+            array[:] = column
+        else:
+            array = np.fromiter((int(value) for value in column),
+                                dtype=dtype, count=len(column))
+        columns[name] = array
+    return columns
+
+
+def select_rows(columns, mask):
+    """
+    Filters a columnar batch with a boolean mask, e.g. batch['age'] > 25.
+
+    Returns:
+        dict: Column name to the selected values
+    """
+    return {name: values[mask] for name, values in columns.items()}
+
+
+def batch_length(columns):
+    """Returns the number of rows in a columnar batch."""
+    return len(next(iter(columns.values()))) if columns else 0
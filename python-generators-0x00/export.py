@@ -0,0 +1,225 @@
+#!/usr/bin/python3
+"""
+Streaming export of user_data to NDJSON or CSV files
+
+Rows are read from the generators in chunks and handed through a bounded
+queue to a writer thread that encodes, compresses and writes them, so the
+database cursor never waits on the disk. Output is split into numbered
+parts once a part reaches rotate_bytes.
+
+Example:
+    export_users('exports/users', fmt='ndjson', compression='gzip',
+                 rotate_bytes=256 * 2**20)
+"""
+
+import csv
+import datetime
+import decimal
+import gzip
+import io
+import itertools
+import json
+import os
+import queue
+import threading
+import time
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+stream_users = __import__('0-stream_users').stream_users
+
+FORMATS = ('ndjson', 'csv')
+COMPRESSIONS = {None: '', 'gzip': '.gz', 'zstd': '.zst'}
+
+_DONE = object()
+
+
+def _json_default(value):
+    """Encodes the non-JSON types returned by the MySQL driver."""
+    if isinstance(value, decimal.Decimal):
+        return int(value) if value == value.to_integral_value() \
+            else float(value)
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    raise TypeError(f"Cannot encode {type(value).__name__}")
+
+
+class _CountingFile:
+    """Binary file wrapper that counts the bytes reaching the disk."""
+
+    def __init__(self, path):
+        self._file = open(path, 'wb')
+        self.bytes_written = 0
+
+    def write(self, data):
+        self.bytes_written += len(data)
+        return self._file.write(data)
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class _PartWriter:
+    """Writes encoded rows to numbered, optionally compressed part files."""
+
+    def __init__(self, prefix, fmt, compression, rotate_bytes):
+        self.prefix = prefix
+        self.fmt = fmt
+        self.compression = compression
+        self.rotate_bytes = rotate_bytes
+        self.files = []
+        self.bytes_written = 0
+        self._raw = None
+        self._stream = None
+        self._columns = None
+
+    def _open(self):
+        path = (f"{self.prefix}-{len(self.files):05d}.{self.fmt}"
+                f"{COMPRESSIONS[self.compression]}")
+        self._raw = _CountingFile(path)
+        if self.compression == 'gzip':
+            self._stream = gzip.GzipFile(fileobj=self._raw, mode='wb')
+        elif self.compression == 'zstd':
+            self._stream = zstandard.ZstdCompressor().stream_writer(
+                self._raw, closefd=False)
+        else:
+            self._stream = self._raw
+        self.files.append(path)
+        if self.fmt == 'csv' and self._columns:
+            self._stream.write(self._csv([self._columns]))
+
+    def _close(self):
+        if self._stream is not self._raw:
+            self._stream.close()
+        self._raw.close()
+        self.bytes_written += self._raw.bytes_written
+        self._raw = self._stream = None
+
+    @staticmethod
+    def _csv(rows):
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        return buffer.getvalue().encode('utf-8')
+
+    def write(self, rows):
+        """Encodes and writes one chunk of row dicts."""
+        if self.fmt == 'csv' and self._columns is None:
+            self._columns = list(rows[0])
+        if self._stream is None:
+            self._open()
+        if self.fmt == 'ndjson':
+            data = ''.join(
+                json.dumps(row, default=_json_default) + '\n' for row in rows
+            ).encode('utf-8')
+        else:
+            data = self._csv(
+                [[row[column] for column in self._columns] for row in rows])
+        self._stream.write(data)
+        if (self.rotate_bytes is not None
+                and self._raw.bytes_written >= self.rotate_bytes):
+            self._close()
+
+    def close(self):
+        """Finishes the current part, if any."""
+        if self._stream is not None:
+            self._close()
+
+
+def export_users(prefix, fmt='ndjson', compression=None, rotate_bytes=None,
+                 rows=None, chunk_rows=1000, queue_chunks=8):
+    """
+    Exports user_data rows to prefix-00000.<fmt>[.gz|.zst], ...
+
+    Args:
+        prefix (str): Path prefix of the part files
+        fmt (str): 'ndjson' or 'csv'; every CSV part starts with a header
+        compression (str): None, 'gzip' or 'zstd' (requires zstandard)
+        rotate_bytes (int): Start a new part once the current one holds
+            this many bytes on disk; one part when None
+        rows (iterable): Row dicts to export; stream_users(fetch_size=...)
+            when omitted
+        chunk_rows (int): Rows handed to the writer thread at a time
+        queue_chunks (int): Chunks buffered between reader and writer
+
+    Returns:
+        dict: Rows, files, bytes written, seconds, rows/s, MB/s, and the
+        seconds the reader spent waiting on the writer
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"fmt must be one of {FORMATS}")
+    if compression not in COMPRESSIONS:
+        raise ValueError(f"compression must be one of {list(COMPRESSIONS)}")
+    if compression == 'zstd' and zstandard is None:
+        raise ImportError("zstd compression requires zstandard: "
+                          "pip install zstandard")
+    if rows is None:
+        rows = stream_users(fetch_size=chunk_rows)
+
+    directory = os.path.dirname(prefix)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    writer = _PartWriter(prefix, fmt, compression, rotate_bytes)
+    chunks = queue.Queue(maxsize=queue_chunks)
+    failure = []
+
+    def write_chunks():
+        try:
+            while True:
+                chunk = chunks.get()
+                if chunk is _DONE:
+                    break
+                writer.write(chunk)
+        except Exception as e:
+            failure.append(e)
+            # Keep draining so the reader is never blocked on a dead writer
+            while chunks.get() is not _DONE:
+                pass
+        finally:
+            try:
+                writer.close()
+            except Exception as e:
+                failure.append(e)
+
+    thread = threading.Thread(target=write_chunks, name='export-writer')
+    thread.start()
+    started = time.monotonic()
+    waited = 0.0
+    count = 0
+    rows = iter(rows)
+    try:
+        while not failure:
+            chunk = list(itertools.islice(rows, chunk_rows))
+            if not chunk:
+                break
+            count += len(chunk)
+            before = time.monotonic()
+            chunks.put(chunk)
+            waited += time.monotonic() - before
+    finally:
+        chunks.put(_DONE)
+        thread.join()
+    if failure:
+        raise failure[0]
+
+    elapsed = time.monotonic() - started
+    report = {
+        'rows': count,
+        'files': writer.files,
+        'bytes_written': writer.bytes_written,
+        'seconds': elapsed,
+        'rows_per_second': count / elapsed if elapsed else 0.0,
+        'mb_per_second': writer.bytes_written / 2**20 / elapsed
+        if elapsed else 0.0,
+        'reader_wait_seconds': waited,
+    }
+    print(f"Exported {count} rows to {len(writer.files)} file(s), "
+          f"{writer.bytes_written / 2**20:.1f} MiB in {elapsed:.1f}s "
+          f"({report['rows_per_second']:.0f} rows/s)")
+    return report
@@ -0,0 +1,395 @@
+#!/usr/bin/python3
+"""
+Local SQLite read-through mirror of the user_data table
+
+The mirror is created from a bulk copy of ALX_prodev.user_data and kept
+fresh by incremental syncs. Once use_mirror() is called, the shared
+connection pool in seed hands out mirror connections, so every generator
+reads the local copy (memory-mapped by SQLite) instead of going over the
+network, without any change to the generators themselves.
+
+Example:
+    mirror = UserDataMirror('user_data.db')
+    mirror.bulk_copy()
+    use_mirror('user_data.db')
+    for user in stream_users():
+        ...
+    mirror.sync()
+"""
+
+import contextlib
+import decimal
+import math
+import sqlite3
+import time
+
+import seed
+
+# Bytes of the mirror file SQLite may memory-map for reads
+MMAP_SIZE = 1 << 30
+
+
+def _sqlite_value(value):
+    """Converts driver values SQLite cannot store, such as Decimal."""
+    if isinstance(value, decimal.Decimal):
+        return int(value) if value == value.to_integral_value() \
+            else float(value)
+    return value
+
+
+class _StdDevPop:
+    """STDDEV_POP aggregate, which SQLite lacks, for the stats queries."""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.squares = 0.0
+
+    def step(self, value):
+        if value is not None:
+            self.count += 1
+            self.total += value
+            self.squares += value * value
+
+    def finalize(self):
+        if not self.count:
+            return None
+        mean = self.total / self.count
+        return math.sqrt(max(self.squares / self.count - mean * mean, 0.0))
+
+
+class MirrorCursor:
+    """
+    Cursor over a mirror connection with the mysql-connector interface the
+    generators use: %s placeholders, column_names and dictionary rows.
+    """
+
+    def __init__(self, connection, dictionary=False):
+        self._cursor = connection.cursor()
+        self._dictionary = dictionary
+
+    @property
+    def column_names(self):
+        return tuple(column[0] for column in self._cursor.description or ())
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    def execute(self, query, params=()):
+        self._cursor.execute(query.replace('%s', '?'),
+                             [_sqlite_value(value) for value in params or ()])
+
+    def _convert(self, rows):
+        if not self._dictionary:
+            return rows
+        names = self.column_names
+        return [dict(zip(names, row)) for row in rows]
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        if row is None:
+            return None
+        return self._convert([row])[0]
+
+    def fetchmany(self, size=1):
+        return self._convert(self._cursor.fetchmany(size))
+
+    def fetchall(self):
+        return self._convert(self._cursor.fetchall())
+
+    def __iter__(self):
+        while True:
+            rows = self.fetchmany(1000)
+            if not rows:
+                return
+            yield from rows
+
+    def close(self):
+        self._cursor.close()
+
+
+class MirrorConnection:
+    """Read-only connection to a mirror, usable wherever seed's are."""
+
+    # Leftover rows on a SQLite cursor never block the next query
+    unread_result = False
+
+    def __init__(self, path):
+        self._connection = sqlite3.connect(
+            f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        self._connection.execute(f"PRAGMA mmap_size = {MMAP_SIZE}")
+        self._connection.create_aggregate('STDDEV_POP', 1, _StdDevPop)
+        self._connection.create_function('FLOOR', 1, math.floor)
+
+    def cursor(self, dictionary=False, buffered=None, **options):
+        return MirrorCursor(self._connection, dictionary)
+
+    def is_connected(self):
+        try:
+            self._connection.execute("SELECT 1")
+            return True
+        except sqlite3.Error:
+            return False
+
+    def commit(self):
+        self._connection.commit()
+
+    def rollback(self):
+        self._connection.rollback()
+
+    def close(self):
+        self._connection.close()
+
+
+def connect_mirror(path):
+    """Opens a read-only mirror connection, or returns None on error."""
+    try:
+        connection = MirrorConnection(path)
+        print(f"Connected to user_data mirror {path}")
+        return connection
+    except sqlite3.Error as e:
+        print(f"Error opening user_data mirror {path}: {e}")
+        return None
+
+
+def use_mirror(path, **options):
+    """
+    Serves the generators' reads from the mirror at path.
+
+    Args:
+        **options: Further keyword arguments for seed.ConnectionPool
+
+    Returns:
+        seed.ConnectionPool: The new shared pool
+    """
+    return seed.configure_pool(connect=lambda: connect_mirror(path),
+                               **options)
+
+
+def use_mysql(**options):
+    """Points the generators back at ALX_prodev."""
+    return seed.configure_pool(**options)
+
+
+class UserDataMirror:
+    """
+    Maintains the local copy of user_data.
+
+    Incremental syncs use change_column (for example an updated_at
+    timestamp) when the table has one, fetching only rows changed since the
+    last sync. Otherwise they diff the primary keys, which picks up inserts
+    and deletes while transferring only the missing rows.
+    """
+
+    def __init__(self, path, change_column=None, batch_size=10000):
+        """
+        Args:
+            path (str): SQLite file holding the mirror
+            change_column (str): Column that grows whenever a row changes
+            batch_size (int): Rows per fetch and per insert batch
+        """
+        self.path = path
+        self.change_column = change_column
+        self.batch_size = batch_size
+        self._local = sqlite3.connect(path)
+        self._local.execute("PRAGMA journal_mode = WAL")
+        self._local.execute("""
+            CREATE TABLE IF NOT EXISTS mirror_state (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            )
+        """)
+        self._local.commit()
+
+    def close(self):
+        """Closes the mirror's write connection."""
+        self._local.close()
+
+    def _get_state(self, key):
+        row = self._local.execute(
+            "SELECT value FROM mirror_state WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_state(self, key, value):
+        self._local.execute(
+            "INSERT INTO mirror_state (key, value) VALUES (?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (key, value))
+
+    def _insert(self, table, columns, rows):
+        placeholders = ', '.join('?' * len(columns))
+        self._local.executemany(
+            f"INSERT OR REPLACE INTO {table} ({', '.join(columns)}) "
+            f"VALUES ({placeholders})",
+            ([_sqlite_value(value) for value in row] for row in rows))
+
+    def _track_watermark(self, columns, rows, watermark):
+        """Returns the highest change_column value seen so far."""
+        if self.change_column is None:
+            return watermark
+        index = columns.index(self.change_column)
+        for row in rows:
+            value = row[index]
+            if watermark is None or value > watermark:
+                watermark = value
+        return watermark
+
+    def bulk_copy(self):
+        """
+        Replaces the mirror with a full copy of user_data.
+
+        The copy is built in a side table and swapped in at the end, so
+        readers see either the old or the new mirror, never a partial one.
+
+        Returns:
+            int: Rows copied
+        """
+        started = time.monotonic()
+        count = 0
+        watermark = None
+        with _source() as connection:
+            cursor = connection.cursor(buffered=False)
+            cursor.execute("SELECT * FROM user_data")
+            columns = list(cursor.column_names)
+            definitions = ', '.join(
+                f"{column} PRIMARY KEY" if column == 'user_id' else column
+                for column in columns)
+            self._local.execute("DROP TABLE IF EXISTS user_data_copy")
+            self._local.execute(f"CREATE TABLE user_data_copy ({definitions})")
+            while True:
+                rows = cursor.fetchmany(self.batch_size)
+                if not rows:
+                    break
+                self._insert('user_data_copy', columns, rows)
+                watermark = self._track_watermark(columns, rows, watermark)
+                count += len(rows)
+            cursor.close()
+
+        self._local.execute("DROP TABLE IF EXISTS user_data")
+        self._local.execute("ALTER TABLE user_data_copy RENAME TO user_data")
+        if self.change_column is not None:
+            self._local.execute(
+                f"CREATE INDEX IF NOT EXISTS idx_user_data_"
+                f"{self.change_column} ON user_data ({self.change_column})")
+        self._set_state('watermark', _state_value(watermark))
+        self._set_state('synced_at', str(time.time()))
+        self._local.commit()
+        print(f"Copied {count} rows to mirror {self.path} in "
+              f"{time.monotonic() - started:.1f}s")
+        return count
+
+    def sync(self):
+        """
+        Brings the mirror up to date with user_data.
+
+        Returns:
+            dict: Rows upserted and deleted
+        """
+        if self.change_column is not None:
+            result = self._sync_changes()
+        else:
+            result = self._sync_keys()
+        self._set_state('synced_at', str(time.time()))
+        self._local.commit()
+        return result
+
+    def _sync_changes(self):
+        """Upserts rows whose change_column passed the saved watermark."""
+        watermark = self._get_state('watermark')
+        latest = None
+        upserted = 0
+        with _source() as connection:
+            cursor = connection.cursor(buffered=False)
+            if watermark is None:
+                cursor.execute("SELECT * FROM user_data")
+            else:
+                # >= re-reads rows sharing the watermark value, which the
+                # upsert makes harmless, instead of missing late writers
+                cursor.execute(
+                    f"SELECT * FROM user_data "
+                    f"WHERE {self.change_column} >= %s", (watermark,))
+            columns = list(cursor.column_names)
+            while True:
+                rows = cursor.fetchmany(self.batch_size)
+                if not rows:
+                    break
+                self._insert('user_data', columns, rows)
+                latest = self._track_watermark(columns, rows, latest)
+                upserted += len(rows)
+            cursor.close()
+        if latest is not None:
+            self._set_state('watermark', _state_value(latest))
+        return {'upserted': upserted, 'deleted': 0}
+
+    def _sync_keys(self):
+        """Copies rows missing locally and drops rows gone remotely."""
+        local = self._local.execute(
+            "SELECT user_id FROM user_data ORDER BY user_id")
+        local_id = _next_id(local)
+        missing = []
+        removed = []
+        with _source() as connection:
+            cursor = connection.cursor(buffered=False)
+            cursor.execute("SELECT user_id FROM user_data ORDER BY user_id")
+            # Merge the two sorted key streams
+            for (remote_id,) in cursor:
+                while local_id is not None and local_id < remote_id:
+                    removed.append(local_id)
+                    local_id = _next_id(local)
+                if local_id == remote_id:
+                    local_id = _next_id(local)
+                else:
+                    missing.append(remote_id)
+            while local_id is not None:
+                removed.append(local_id)
+                local_id = _next_id(local)
+            cursor.close()
+
+            for start in range(0, len(missing), self.batch_size):
+                keys = missing[start:start + self.batch_size]
+                cursor = connection.cursor()
+                cursor.execute(
+                    f"SELECT * FROM user_data WHERE user_id IN "
+                    f"({', '.join(['%s'] * len(keys))})", keys)
+                self._insert('user_data', list(cursor.column_names),
+                             cursor.fetchall())
+                cursor.close()
+
+        self._local.executemany(
+            "DELETE FROM user_data WHERE user_id = ?",
+            ((user_id,) for user_id in removed))
+        return {'upserted': len(missing), 'deleted': len(removed)}
+
+
+@contextlib.contextmanager
+def _source():
+    """
+    Yields a dedicated ALX_prodev connection. The pool is not used because
+    it may itself be serving the mirror.
+    """
+    connection = seed.connect_to_prodev()
+    if connection is None:
+        raise sqlite3.OperationalError("Cannot reach ALX_prodev to sync")
+    try:
+        yield connection
+    finally:
+        connection.close()
+
+
+def _next_id(cursor):
+    """Returns the next user_id from a local key cursor, or None."""
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def _state_value(value):
+    """Stores watermarks as text, which compares like the source values."""
+    if value is None:
+        return None
+    return value.isoformat(sep=' ') if hasattr(value, 'isoformat') \
+        else str(value)
@@ -0,0 +1,262 @@
+#!/usr/bin/python3
+"""
+Composable generator pipeline over user_data with SQL pushdown
+
+Filters and projections that can be expressed in SQL are compiled into the
+query's WHERE clause and column list, so rows that would be dropped never
+leave the database. Anything else (Python callables, and every stage after
+one) runs as a generator stage on the client.
+
+Example:
+    adults = users().filter(col('age') > 25).project('name', 'email')
+    for batch in adults.batches(100):
+        ...
+"""
+
+import operator
+import re
+
+_IDENTIFIER = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+_OPERATORS = {
+    '=': operator.eq,
+    '!=': operator.ne,
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+}
+
+
+def _identifier(name):
+    """Returns name if it is a safe SQL identifier, else raises ValueError."""
+    if not _IDENTIFIER.match(name):
+        raise ValueError(f"Invalid column name: {name!r}")
+    return name
+
+
+class Condition:
+    """
+    Comparison between a column and a value.
+
+    Compiles to a parameterized SQL predicate, and can also be called on a
+    row dict when it has to run in Python.
+    """
+
+    def __init__(self, column, op, value):
+        self.column = _identifier(column)
+        self.op = op
+        self.value = value
+
+    def sql(self):
+        """
+        Returns:
+            tuple: (SQL predicate, parameter list)
+        """
+        if self.op == 'in':
+            if not self.value:
+                # IN () is a syntax error; an empty list matches no row
+                return "FALSE", []
+            placeholders = ', '.join(['%s'] * len(self.value))
+            return f"{self.column} IN ({placeholders})", list(self.value)
+        return f"{self.column} {self.op} %s", [self.value]
+
+    def __call__(self, row):
+        if self.op == 'in':
+            return row[self.column] in self.value
+        return _OPERATORS[self.op](row[self.column], self.value)
+
+    def __repr__(self):
+        return f"Condition({self.column!r}, {self.op!r}, {self.value!r})"
+
+
+class col:
+    """Builds Conditions with comparison operators, e.g. col('age') > 25."""
+
+    def __init__(self, name):
+        self.name = _identifier(name)
+
+    def __eq__(self, value):
+        return Condition(self.name, '=', value)
+
+    def __ne__(self, value):
+        return Condition(self.name, '!=', value)
+
+    def __lt__(self, value):
+        return Condition(self.name, '<', value)
+
+    def __le__(self, value):
+        return Condition(self.name, '<=', value)
+
+    def __gt__(self, value):
+        return Condition(self.name, '>', value)
+
+    def __ge__(self, value):
+        return Condition(self.name, '>=', value)
+
+    def isin(self, values):
+        return Condition(self.name, 'in', tuple(values))
+
+    __hash__ = None
+
+
+class Pipeline:
+    """
+    Immutable description of a query plus Python stages.
+
+    Each method returns a new Pipeline; nothing runs until the pipeline is
+    iterated.
+    """
+
+    def __init__(self, table='user_data'):
+        self.table = _identifier(table)
+        self.columns = None
+        self.conditions = ()
+        self.limit = None
+        self.stages = ()
+
+    def _copy(self, **changes):
+        clone = Pipeline.__new__(Pipeline)
+        clone.__dict__.update(self.__dict__, **changes)
+        return clone
+
+    @property
+    def _pushable(self):
+        """Whether a new stage can still be compiled into the SQL."""
+        return not self.stages and self.limit is None
+
+    def filter(self, predicate):
+        """
+        Keep rows matching predicate.
+
+        Args:
+            predicate: A Condition such as col('age') > 25, pushed into the
+                WHERE clause when possible, or any callable taking a row
+        """
+        if isinstance(predicate, Condition) and self._pushable:
+            return self._copy(conditions=self.conditions + (predicate,))
+        return self._copy(stages=self.stages + (('filter', predicate),))
+
+    def project(self, *columns):
+        """Keep only the given columns of each row."""
+        columns = tuple(_identifier(column) for column in columns)
+        if self._pushable:
+            if self.columns is not None:
+                missing = set(columns) - set(self.columns)
+                if missing:
+                    raise ValueError(f"Columns not selected: {sorted(missing)}")
+            return self._copy(columns=columns)
+        return self._copy(stages=self.stages + (('project', columns),))
+
+    def map(self, function):
+        """Transform each row with function; always runs in Python."""
+        return self._copy(stages=self.stages + (('map', function),))
+
+    def take(self, count):
+        """Stop after count rows, as a LIMIT when nothing runs in Python."""
+        if self._pushable:
+            return self._copy(limit=count)
+        return self._copy(stages=self.stages + (('take', count),))
+
+    def sql(self):
+        """
+        Returns:
+            tuple: (SQL query, parameter list) sent to the database
+        """
+        columns = ', '.join(self.columns) if self.columns else '*'
+        query = f"SELECT {columns} FROM {self.table}"
+        params = []
+        if self.conditions:
+            predicates = []
+            for condition in self.conditions:
+                predicate, values = condition.sql()
+                predicates.append(predicate)
+                params.extend(values)
+            query += " WHERE " + " AND ".join(predicates)
+        if self.limit is not None:
+            query += " LIMIT %s"
+            params.append(self.limit)
+        return query, params
+
+    def _run_stages(self, rows):
+        """Chain the Python stages onto an iterator of rows."""
+        for kind, argument in self.stages:
+            if kind == 'filter':
+                rows = filter(argument, rows)
+            elif kind == 'map':
+                rows = map(argument, rows)
+            elif kind == 'project':
+                rows = _project(rows, argument)
+            elif kind == 'take':
+                rows = _take(rows, argument)
+        return rows
+
+    def _fetch(self, batch_size):
+        """Yield rows from the compiled query, batch_size per round trip."""
+        # Imported here because seed needs mysql-connector, which building
+        # and compiling pipelines does not
+        import seed
+
+        query, params = self.sql()
+        with seed.pooled_connection() as connection:
+            if not connection:
+                return
+            cursor = connection.cursor(dictionary=True)
+            try:
+                cursor.execute(query, params)
+                while True:
+                    batch = cursor.fetchmany(batch_size)
+                    if not batch:
+                        break
+                    for row in batch:
+                        yield row
+            finally:
+                # A pipeline that stopped early leaves rows unread; the pool
+                # then drops the connection instead of draining them
+                if not connection.unread_result:
+                    cursor.close()
+
+    def rows(self, batch_size=1000):
+        """
+        Yields:
+            Each row that passes every stage
+        """
+        return self._run_stages(self._fetch(batch_size))
+
+    def batches(self, batch_size):
+        """
+        Yields:
+            list: Up to batch_size rows that passed every stage
+        """
+        batch = []
+        for row in self.rows(batch_size):
+            batch.append(row)
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def __iter__(self):
+        return iter(self.rows())
+
+
+def _project(rows, columns):
+    """Yield each row reduced to columns."""
+    for row in rows:
+        yield {column: row[column] for column in columns}
+
+
+def _take(rows, count):
+    """Yield at most count rows."""
+    if count <= 0:
+        return
+    for index, row in enumerate(rows, 1):
+        yield row
+        if index >= count:
+            return
+
+
+def users():
+    """Returns a Pipeline over the user_data table."""
+    return Pipeline('user_data')
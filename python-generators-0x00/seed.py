@@ -5,9 +5,36 @@ Database setup script for ALX_prodev with user_data table
 
 import mysql.connector
 from mysql.connector import Error
+from mysql.connector.errors import PoolError
+import collections
+import contextlib
 import csv
+import functools
+import itertools
+import operator
+import os
+import threading
+import time
 import uuid
 
+import aggregates
+
+
+# Connection settings for the ALX_prodev database
+PRODEV_CONFIG = {
+    'host': 'localhost',
+    'user': 'root',
+    'password': 'root',
+    'database': 'ALX_prodev',
+}
+
+# Namespace for deterministic user ids generated by bulk loads
+USER_ID_NAMESPACE = uuid.UUID('6f1c3a52-8d47-4d0e-9c1b-2a5e7f3b9d10')
+
+# Row shapes the generators can yield: a dict per row, a plain tuple, or
+# a namedtuple record type built once per query from the column list
+ROW_FORMATS = ('dict', 'tuple', 'record')
+
 
 def connect_db():
     """Connects to the MySQL database server"""
@@ -39,12 +66,7 @@ def create_database(connection):
 def connect_to_prodev():
     """Connects to the ALX_prodev database in MySQL"""
     try:
-        connection = mysql.connector.connect(
-            host='localhost',
-            user='root',
-            password='root',
-            database='ALX_prodev'
-        )
+        connection = mysql.connector.connect(**PRODEV_CONFIG)
         if connection.is_connected():
             print("Connected to ALX_prodev database")
             return connection
@@ -53,6 +75,203 @@ def connect_to_prodev():
         return None
 
 
+class ConnectionPool:
+    """
+    Bounded pool of reusable connections to ALX_prodev.
+
+    At most max_size connections are checked out at once; further callers
+    wait up to timeout seconds for one to be released. Idle connections
+    that have not been used for ping_interval seconds are pinged before
+    being handed out again, and dead ones are replaced.
+    """
+
+    def __init__(self, connect=None, max_size=5, timeout=30.0,
+                 ping_interval=30.0):
+        """
+        Args:
+            connect (callable): Opens a new connection, or returns None
+            max_size (int): Maximum number of connections in use at once
+            timeout (float): Seconds to wait for a free connection
+            ping_interval (float): Idle seconds after which a connection
+                is checked for liveness before reuse
+        """
+        self._connect = connect or connect_to_prodev
+        self.max_size = max_size
+        self.timeout = timeout
+        self.ping_interval = ping_interval
+        self._idle = collections.deque()
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.discarded = 0
+
+    def acquire(self):
+        """
+        Check out a connection, reusing an idle one when possible.
+
+        Returns:
+            Connection to ALX_prodev, or None if a new one could not be opened
+        """
+        if not self._slots.acquire(timeout=self.timeout):
+            raise PoolError("Timed out waiting for a pooled connection")
+
+        try:
+            while True:
+                with self._lock:
+                    if not self._idle:
+                        self.misses += 1
+                        break
+                    connection, released_at = self._idle.pop()
+                if (time.monotonic() - released_at < self.ping_interval
+                        or connection.is_connected()):
+                    with self._lock:
+                        self.hits += 1
+                    return connection
+                self._discard(connection)
+
+            connection = self._connect()
+        except BaseException:
+            # A connect factory that raises must not shrink the pool
+            self._slots.release()
+            raise
+        if connection is None:
+            self._slots.release()
+        return connection
+
+    def release(self, connection):
+        """Return a checked-out connection to the pool."""
+        if connection is None:
+            return
+        # A half-read result would break the next query on this connection
+        reusable = not getattr(connection, 'unread_result', False)
+        if reusable:
+            try:
+                # End the read snapshot so the next user sees fresh data
+                connection.rollback()
+            except Error:
+                reusable = False
+        if reusable:
+            with self._lock:
+                self._idle.append((connection, time.monotonic()))
+        else:
+            self._discard(connection)
+        self._slots.release()
+
+    def _discard(self, connection):
+        """Close a connection that must not be reused."""
+        with self._lock:
+            self.discarded += 1
+        try:
+            connection.close()
+        except Error:
+            pass
+
+    def close(self):
+        """Close every idle connection."""
+        with self._lock:
+            idle, self._idle = self._idle, collections.deque()
+        for connection, _ in idle:
+            try:
+                connection.close()
+            except Error:
+                pass
+
+    def stats(self):
+        """
+        Returns:
+            dict: Pool hits, misses, discarded and idle connection counts
+        """
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'discarded': self.discarded,
+                'idle': len(self._idle),
+                'max_size': self.max_size,
+            }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Returns the shared ALX_prodev connection pool, creating it on first use"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool()
+        return _pool
+
+
+def configure_pool(**options):
+    """
+    Replaces the shared connection pool, closing the previous one.
+
+    Args:
+        **options: Keyword arguments for ConnectionPool
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+        _pool = ConnectionPool(**options)
+        return _pool
+
+
+@contextlib.contextmanager
+def pooled_connection():
+    """
+    Context manager that checks a connection out of the shared pool and
+    returns it on exit, including when a generator using it is closed early.
+
+    Yields:
+        Connection to ALX_prodev, or None if one could not be opened
+    """
+    pool = get_pool()
+    connection = pool.acquire()
+    try:
+        yield connection
+    finally:
+        pool.release(connection)
+
+
+def row_cursor(connection, row_format='dict', **options):
+    """
+    Opens a cursor for row_format: a dictionary cursor for 'dict', and a
+    plain tuple cursor for 'tuple' and 'record'.
+    """
+    if row_format not in ROW_FORMATS:
+        raise ValueError(f"row_format must be one of {ROW_FORMATS}")
+    return connection.cursor(dictionary=row_format == 'dict', **options)
+
+
+@functools.lru_cache(maxsize=32)
+def record_type(column_names):
+    """Returns the namedtuple type for a column list, created once."""
+    return collections.namedtuple('UserRecord', column_names)
+
+
+def row_maker(cursor, row_format):
+    """
+    Returns a callable turning a fetched row into row_format, or None when
+    the cursor already returns rows in that format.
+    """
+    if row_format == 'record':
+        # tuple.__new__ skips the Python-level namedtuple._make call
+        return functools.partial(
+            tuple.__new__, record_type(tuple(cursor.column_names)))
+    return None
+
+
+def column_getter(cursor, row_format, column):
+    """Returns a callable reading column from rows in row_format."""
+    if row_format == 'dict':
+        return operator.itemgetter(column)
+    return operator.itemgetter(list(cursor.column_names).index(column))
+
+
 def create_table(connection):
     """Creates a table user_data if it does not exist with the required fields"""
     try:
@@ -74,35 +293,158 @@ def create_table(connection):
         print(f"Error creating table: {e}")
 
 
-def insert_data(connection, csv_file):
-    """Inserts data from CSV file into the database if it does not exist"""
+def create_checkpoint_table(connection):
+    """Creates the load_checkpoint table used to resume interrupted loads"""
+    cursor = connection.cursor()
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS load_checkpoint (
+        source VARCHAR(255) PRIMARY KEY,
+        rows_done BIGINT NOT NULL
+    )
+    """)
+    connection.commit()
+    cursor.close()
+
+
+def _row_id(position, email):
+    """Derives a stable user_id from the row position and email.
+
+    Replaying a chunk produces the same ids, so bulk_insert recognises
+    rows it already loaded instead of duplicating users.
+    """
+    return str(uuid.uuid5(USER_ID_NAMESPACE, f"{position}|{email}"))
+
+
+def bulk_insert(connection, rows, source, start=0, chunk_size=1000,
+                progress_interval=5.0):
+    """
+    Inserts rows into user_data in chunks, committing each chunk together
+    with a checkpoint for source and the age aggregates of its new rows.
+
+    Args:
+        connection: Open connection to ALX_prodev
+        rows (iterable): (name, email, age) tuples, starting at position start
+        source (str): Checkpoint key identifying the data set
+        start (int): Position of the first row in rows
+        chunk_size (int): Rows sent and committed per chunk
+        progress_interval (float): Seconds between progress reports
+
+    Returns:
+        int: Position after the last committed row
+    """
+    insert_query = """
+    INSERT INTO user_data (user_id, name, email, age)
+    VALUES (%s, %s, %s, %s)
+    """
+    checkpoint_query = """
+    INSERT INTO load_checkpoint (source, rows_done) VALUES (%s, %s)
+    ON DUPLICATE KEY UPDATE rows_done = VALUES(rows_done)
+    """
+    cursor = connection.cursor()
+    position = start
+    started = last_report = time.monotonic()
     try:
+        rows = iter(rows)
+        while True:
+            chunk = [
+                (_row_id(position + i, email), name, email, age)
+                for i, (name, email, age) in enumerate(
+                    itertools.islice(rows, chunk_size))
+            ]
+            if not chunk:
+                break
+            # Skip rows a replayed chunk already loaded, so that the
+            # aggregates only count the rows really inserted
+            cursor.execute(
+                f"SELECT user_id FROM user_data WHERE user_id IN "
+                f"({', '.join(['%s'] * len(chunk))}) FOR UPDATE",
+                [row[0] for row in chunk]
+            )
+            existing = {user_id for (user_id,) in cursor.fetchall()}
+            new_rows = [row for row in chunk if row[0] not in existing]
+            if new_rows:
+                # executemany is rewritten into a single multi-row INSERT
+                cursor.executemany(insert_query, new_rows)
+                aggregates.record_inserts(cursor,
+                                          (row[3] for row in new_rows))
+            cursor.execute(checkpoint_query, (source, position + len(chunk)))
+            connection.commit()
+            position += len(chunk)
+
+            now = time.monotonic()
+            if now - last_report >= progress_interval:
+                rate = (position - start) / (now - started)
+                print(f"{position} rows loaded ({rate:.0f} rows/s)")
+                last_report = now
+    except Error:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+
+    elapsed = time.monotonic() - started
+    if position > start and elapsed > 0:
+        rate = (position - start) / elapsed
+        print(f"Loaded {position - start} rows in {elapsed:.1f}s "
+              f"({rate:.0f} rows/s)")
+    return position
+
+
+def insert_data(connection, csv_file, chunk_size=1000, resume=True,
+                force=False):
+    """
+    Inserts data from CSV file into the database in committed chunks.
+
+    A load that dies part way resumes from the last committed chunk, and
+    chunks that were already loaded are skipped rather than duplicated.
+    Rows loaded without a checkpoint, e.g. by an older version of this
+    loader, have ids that cannot be matched, so a non-empty user_data with
+    no checkpoint for csv_file is left alone unless force is given.
+
+    Args:
+        connection: Open connection to ALX_prodev
+        csv_file (str): Path to the CSV file with name, email and age columns
+        chunk_size (int): Rows per INSERT batch and per transaction
+        resume (bool): Continue from the saved checkpoint for csv_file
+        force (bool): Load csv_file even into a non-empty user_data that
+            has no checkpoint for it
+    """
+    source = os.path.abspath(csv_file)
+    try:
+        create_checkpoint_table(connection)
+        aggregates.create_aggregate_tables(connection)
+
         cursor = connection.cursor()
-        
-        # Check if data already exists
-        cursor.execute("SELECT COUNT(*) FROM user_data")
-        count = cursor.fetchone()[0]
-        
-        if count > 0:
+        cursor.execute(
+            "SELECT rows_done FROM load_checkpoint WHERE source = %s",
+            (source,)
+        )
+        checkpoint = cursor.fetchone()
+        populated = False
+        if checkpoint is None and not force:
+            cursor.execute("SELECT 1 FROM user_data LIMIT 1")
+            populated = cursor.fetchone() is not None
+        cursor.close()
+        if populated:
             print("Data already exists in the table")
-            cursor.close()
+            print("It has no load checkpoint for this file; pass force=True "
+                  "to load the file again anyway")
             return
-        
-        # Read CSV file and insert data
+
+        start = checkpoint[0] if resume and checkpoint else 0
+
         with open(csv_file, 'r', newline='', encoding='utf-8') as file:
             csv_reader = csv.DictReader(file)
-            for row in csv_reader:
-                # Generate UUID for user_id if not present
-                user_id = str(uuid.uuid4())
-                insert_query = """
-                INSERT INTO user_data (user_id, name, email, age)
-                VALUES (%s, %s, %s, %s)
-                """
-                cursor.execute(insert_query, (user_id, row['name'], row['email'], int(row['age'])))
-        
-        connection.commit()
-        cursor.close()
-        print("Data inserted successfully")
+            rows = (
+                (row['name'], row['email'], int(row['age']))
+                for row in itertools.islice(csv_reader, start, None)
+            )
+            done = bulk_insert(connection, rows, source, start, chunk_size)
+
+        if done == start and start > 0:
+            print("Data already exists in the table")
+        else:
+            print("Data inserted successfully")
     except Error as e:
         print(f"Error inserting data: {e}")
     except FileNotFoundError:
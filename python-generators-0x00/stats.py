@@ -0,0 +1,213 @@
+#!/usr/bin/python3
+"""
+Aggregate statistics over user_data, pushed down to SQL where possible
+and computed in one streaming pass otherwise
+"""
+
+import math
+import random
+
+
+class RunningStats:
+    """
+    One-pass count, mean, variance, min and max using Welford's algorithm,
+    which stays numerically stable without keeping the values.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.min = None
+        self.max = None
+
+    def add(self, value):
+        """Adds one value to the running totals."""
+        value = float(value)
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    @property
+    def variance(self):
+        """Population variance of the values seen so far."""
+        return self._m2 / self.count if self.count else 0.0
+
+    @property
+    def stddev(self):
+        """Population standard deviation of the values seen so far."""
+        return math.sqrt(self.variance)
+
+
+class QuantileSketch:
+    """
+    Bounded-memory quantile estimator in the style of the KLL sketch.
+
+    Values are buffered in levels where an item at level i stands for
+    2**i inputs. When a level fills up it is sorted and every other item
+    is promoted, so memory grows with capacity * log2(n / capacity)
+    while rank error stays around 1 / capacity.
+    """
+
+    def __init__(self, capacity=200, seed=None):
+        """
+        Args:
+            capacity (int): Items kept per level before compacting
+            seed: Seed for the compaction coin flips, for repeatable results
+        """
+        self.capacity = capacity
+        self.count = 0
+        self._levels = [[]]
+        self._rng = random.Random(seed)
+
+    def add(self, value):
+        """Adds one value to the sketch."""
+        self._levels[0].append(value)
+        self.count += 1
+        if len(self._levels[0]) >= self.capacity:
+            self._compact()
+
+    def _compact(self):
+        """Halves every full level into the level above it."""
+        level = 0
+        while (level < len(self._levels)
+               and len(self._levels[level]) >= self.capacity):
+            items = sorted(self._levels[level])
+            # An odd item out stays behind so no weight is lost
+            leftover = [items.pop()] if len(items) % 2 else []
+            if level + 1 == len(self._levels):
+                self._levels.append([])
+            self._levels[level + 1].extend(items[self._rng.randint(0, 1)::2])
+            self._levels[level] = leftover
+            level += 1
+
+    def quantile(self, q):
+        """
+        Args:
+            q (float): Quantile between 0 and 1
+
+        Returns:
+            Estimated value at quantile q, or None if the sketch is empty
+        """
+        weighted = sorted(
+            (value, 1 << level)
+            for level, items in enumerate(self._levels)
+            for value in items
+        )
+        if not weighted:
+            return None
+        total = sum(weight for _, weight in weighted)
+        target = q * total
+        cumulative = 0
+        for value, weight in weighted:
+            cumulative += weight
+            if cumulative >= target:
+                return value
+        return weighted[-1][0]
+
+
+def sql_summary(connection, column='age', table='user_data'):
+    """
+    Computes count, mean, standard deviation, min and max in the database.
+
+    Returns:
+        dict: count, mean, stddev, min and max of column
+    """
+    cursor = connection.cursor()
+    cursor.execute(
+        f"SELECT COUNT({column}), AVG({column}), STDDEV_POP({column}), "
+        f"MIN({column}), MAX({column}) FROM {table}"
+    )
+    count, mean, stddev, low, high = cursor.fetchone()
+    cursor.close()
+    return {
+        'count': count,
+        'mean': float(mean) if mean is not None else 0.0,
+        'stddev': float(stddev) if stddev is not None else 0.0,
+        'min': float(low) if low is not None else None,
+        'max': float(high) if high is not None else None,
+    }
+
+
+def sql_histogram(connection, bucket_width=1, column='age', table='user_data'):
+    """
+    Counts rows per bucket of column in the database.
+
+    Args:
+        bucket_width (int): Width of each bucket; 1 gives exact counts
+            per distinct integer value
+
+    Returns:
+        list: (bucket start, row count) pairs in ascending order
+    """
+    cursor = connection.cursor()
+    cursor.execute(
+        f"SELECT FLOOR({column} / %s) * %s AS bucket, COUNT(*) "
+        f"FROM {table} GROUP BY bucket ORDER BY bucket",
+        (bucket_width, bucket_width)
+    )
+    histogram = [(float(bucket), count) for bucket, count in cursor.fetchall()]
+    cursor.close()
+    return histogram
+
+
+def histogram_quantile(histogram, q):
+    """
+    Args:
+        histogram (list): (bucket start, count) pairs in ascending order
+        q (float): Quantile between 0 and 1
+
+    Returns:
+        Start of the bucket holding quantile q, or None if empty
+    """
+    total = sum(count for _, count in histogram)
+    if not total:
+        return None
+    target = q * total
+    cumulative = 0
+    for bucket, count in histogram:
+        cumulative += count
+        if cumulative >= target:
+            return bucket
+    return histogram[-1][0]
+
+
+def summarize(values, quantiles=(0.5, 0.95, 0.99), capacity=200):
+    """
+    Computes summary statistics in a single pass over values.
+
+    Args:
+        values (iterable): Numbers to summarize, e.g. a generator
+        quantiles (tuple): Quantiles to estimate
+        capacity (int): Size of the quantile sketch
+
+    Returns:
+        dict: count, mean, stddev, min, max and one p<N> entry per quantile
+    """
+    running = RunningStats()
+    sketch = QuantileSketch(capacity)
+    for value in values:
+        value = float(value)
+        running.add(value)
+        sketch.add(value)
+
+    summary = {
+        'count': running.count,
+        'mean': running.mean,
+        'stddev': running.stddev,
+        'min': running.min,
+        'max': running.max,
+    }
+    for q in quantiles:
+        summary[quantile_label(q)] = sketch.quantile(q)
+    return summary
+
+
+def quantile_label(q):
+    """Returns the summary key for quantile q, e.g. 'p95' for 0.95."""
+    return f"p{q * 100:g}"
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""Unit tests for async_streams module"""
+
+import unittest
+from contextlib import aclosing
+from unittest.mock import AsyncMock, Mock, patch
+
+import async_streams
+from async_streams import (async_lazy_paginate, async_stream_users,
+                           async_stream_users_in_batches)
+
+USERS = [(f"{i:04d}", f"user{i}", f"user{i}@example.com", 20 + i % 50)
+         for i in range(25)]
+
+
+@unittest.skipIf(async_streams.aiosqlite is None, "aiosqlite not installed")
+class TestAsyncStreamsOnSqlite(unittest.IsolatedAsyncioTestCase):
+    """Test cases for the async generators on an in-memory aiosqlite stand-in"""
+
+    async def asyncSetUp(self):
+        """Create a user_data table holding USERS"""
+        self.connection = await async_streams.connect_sqlite(":memory:")
+        await self.connection.execute(
+            "CREATE TABLE user_data (user_id TEXT PRIMARY KEY, name TEXT, "
+            "email TEXT, age INTEGER)")
+        # Inserted in reverse to check pages come back in user_id order
+        await self.connection.executemany(
+            "INSERT INTO user_data VALUES (?, ?, ?, ?)", reversed(USERS))
+        await self.connection.commit()
+
+    async def asyncTearDown(self):
+        await self.connection.close()
+
+    async def test_stream_users(self):
+        """Test that every row is yielded as a dict"""
+        users = [user async for user in
+                 async_stream_users(self.connection, fetch_size=4)]
+        self.assertEqual(sorted(user['user_id'] for user in users),
+                         [user[0] for user in USERS])
+        self.assertEqual(set(users[0]), {'user_id', 'name', 'email', 'age'})
+
+    async def test_stream_users_in_batches(self):
+        """Test that batches hold at most batch_size rows"""
+        sizes = [len(batch) async for batch in
+                 async_stream_users_in_batches(10, self.connection)]
+        self.assertEqual(sizes, [10, 10, 5])
+
+    async def test_lazy_paginate(self):
+        """Test that pages come in user_id order without gaps"""
+        pages = [page async for page in
+                 async_lazy_paginate(7, self.connection)]
+        self.assertEqual([len(page) for page in pages], [7, 7, 7, 4])
+        self.assertEqual([user['user_id'] for page in pages for user in page],
+                         [user[0] for user in USERS])
+
+    async def test_early_stop_leaves_connection_usable(self):
+        """Test that breaking out stops the reader and keeps the connection"""
+        async with aclosing(async_stream_users(
+                self.connection, fetch_size=2, read_ahead=1)) as users:
+            async for _ in users:
+                break
+        async with self.connection.execute(
+                "SELECT COUNT(*) FROM user_data") as cursor:
+            self.assertEqual(await cursor.fetchone(), (len(USERS),))
+
+    async def test_reader_error_is_raised(self):
+        """Test that an error in the reader task reaches the consumer"""
+        await self.connection.execute("DROP TABLE user_data")
+        with self.assertRaises(Exception):
+            async for _ in async_stream_users(self.connection):
+                pass
+
+
+class TestAsyncStreamsEarlyStopOnMysql(unittest.IsolatedAsyncioTestCase):
+    """Test cases for stopping early on an unbuffered MySQL cursor"""
+
+    async def test_owned_connection_is_dropped(self):
+        """Test that the owned connection is closed instead of the cursor"""
+        cursor = Mock()
+        cursor.description = [('user_id',), ('age',)]
+        cursor.execute = AsyncMock()
+        cursor.fetchmany = AsyncMock(return_value=[('1', 30), ('2', 40)])
+        cursor.close = AsyncMock()
+        connection = Mock()
+        connection.cursor = AsyncMock(return_value=cursor)
+        connection.close = Mock(return_value=None)
+
+        with patch.object(async_streams, 'aiomysql', Mock()), \
+                patch.object(async_streams, 'connect_mysql',
+                             AsyncMock(return_value=connection)):
+            async with aclosing(async_stream_users(fetch_size=2)) as users:
+                async for user in users:
+                    self.assertEqual(user, {'user_id': '1', 'age': 30})
+                    break
+
+        cursor.close.assert_not_awaited()
+        connection.close.assert_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
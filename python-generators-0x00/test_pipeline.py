@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""Unit tests for pipeline module"""
+
+import sqlite3
+import unittest
+
+from pipeline import col, users
+
+
+class TestConditionSql(unittest.TestCase):
+    """Test cases for compiling conditions into the WHERE clause"""
+
+    def test_comparison(self):
+        """Test that a comparison compiles to one placeholder"""
+        self.assertEqual(users().filter(col('age') > 25).sql(),
+                         ("SELECT * FROM user_data WHERE age > %s", [25]))
+
+    def test_isin(self):
+        """Test that isin() compiles to a placeholder per value"""
+        query, params = users().filter(col('age').isin([30, 40])).sql()
+        self.assertEqual(query, "SELECT * FROM user_data WHERE age IN (%s, %s)")
+        self.assertEqual(params, [30, 40])
+
+    def test_empty_isin_matches_nothing(self):
+        """Test that isin(()) compiles to valid SQL matching no row"""
+        pipeline = users().filter(col('age') > 25).filter(col('age').isin(()))
+        query, params = pipeline.sql()
+        self.assertEqual(query, "SELECT * FROM user_data WHERE age > %s AND FALSE")
+        self.assertEqual(params, [25])
+        self.assertFalse(col('age').isin(())({'age': 30}))
+
+        connection = sqlite3.connect(":memory:")
+        self.addCleanup(connection.close)
+        connection.execute("CREATE TABLE user_data (user_id TEXT, age INTEGER)")
+        connection.execute("INSERT INTO user_data VALUES ('0001', 30)")
+        self.assertEqual(
+            connection.execute(query.replace('%s', '?'), params).fetchall(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()